@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+# Array helpers
+
+
+def map_unique(values, func, dtype=object, missing=np.nan):
+    """Returns func applied to each of values, calling it once per distinct value
+
+    values can have any shape, missing values get missing without a call.
+    When dtype is a list, func returns one value per dtype and a tuple of
+    arrays is returned.
+    """
+
+    values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values.ravel())
+    results = [func(value) for value in uniques]
+
+    def broadcast(results, dtype):
+        # filled one by one so tuples and lists stay single values, and the
+        # last slot is picked by the -1 code of missing values
+        mapped = np.empty(len(results) + 1, dtype=dtype)
+        for i, result in enumerate(results):
+            mapped[i] = result
+        mapped[-1] = missing
+        return mapped[codes].reshape(values.shape)
+
+    if not isinstance(dtype, list):
+        return broadcast(results, dtype)
+    return tuple(broadcast([result[i] for result in results], d) for i, d in enumerate(dtype))
@@ -0,0 +1,415 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import resource
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import pandas as pd
+
+from cache import ResultCache
+from dataset import DATASET_ROOT
+from hyphens import DICTIONARY_PATH
+from profiling import write_profile
+from table import Table
+from writers import FORMATS
+
+# Batch runner
+
+# seconds between looks at the task queue while a worker is free
+POLL_INTERVAL = 0.1
+
+
+def process_table(filename, table_options, output_format="xlsx", destination=None,
+                  cache_dir=None):
+    """Parses one workbook, writes its output file and returns the table
+
+    With a cache_dir, unchanged workbooks are loaded from the result cache.
+    """
+
+    if cache_dir:
+        table = ResultCache(cache_dir).load_table(filename, table_options)
+    else:
+        table = Table(filename, **table_options)
+
+    # write_dataset makes its own partition directories
+    out_dir = os.path.dirname(table.out_filename)
+    if out_dir and output_format != "dataset":
+        os.makedirs(out_dir, exist_ok=True)
+
+    with table.profiler.measure(f"write_{output_format}"):
+        table.write_output(output_format, destination)
+    return table
+
+
+def write_report(results, total, filename):
+    """Writes the failed results to a json report"""
+
+    failed = [r for r in results if r["status"] != "ok"]
+    report = {
+        "total": total,
+        "succeeded": total - len(failed),
+        "failed": failed,
+    }
+
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def get_rss():
+    """Returns the resident memory of this process in MB"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        # peak instead of current, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_table(filename, **task_options):
+    """Runs process_table and returns the fields it adds to the result"""
+
+    table = process_table(filename, **task_options)
+
+    profile = []
+    if table.profiler.enabled:
+        profile = table.get_profile().to_dict(orient="records")
+    return {"table_id": table.id, "profile": profile}
+
+
+def worker(conn, task, max_tasks, max_memory, task_options):
+    """Runs tables sent over conn until told to stop or due for recycling
+
+    task is called with each filename and the task_options keyword
+    arguments, and returns a dict of fields to add to the result.
+    """
+
+    tasks = 0
+
+    while True:
+        filename = conn.recv()
+        if filename is None:
+            break
+
+        start = time.perf_counter()
+        result = {"filename": filename, "table_id": "", "status": "ok", "error": "",
+                  "profile": []}
+        try:
+            result.update(task(filename, **task_options))
+        except Exception:
+            result["status"], result["error"] = "error", traceback.format_exc()
+        result["elapsed"] = round(time.perf_counter() - start, 3)
+
+        tasks += 1
+        retire = tasks >= max_tasks
+        if max_memory and get_rss() > max_memory:
+            retire = True
+        result["retire"] = retire
+
+        conn.send(result)
+
+        if retire:
+            break
+
+    conn.close()
+
+
+class BatchRunner():
+    """Spreads tables over a pool of worker processes
+
+    Each worker handles one table at a time, is killed if that table runs
+    past timeout seconds, and is replaced after max_tasks tables or once its
+    resident memory passes max_memory MB.
+
+    With a cache_dir, workbooks that did not change since an earlier run
+    are not parsed again, see cache.py.
+
+    If profile is a csv or json path, every table is profiled and the
+    steps of all tables are written there along with a per-step summary.
+
+    Workers run task on each table, run_table unless given, with the
+    task_options keyword arguments.
+    """
+
+    def __init__(self, workers=None, timeout=300, max_tasks=25, max_memory=None,
+                 report="failures.json", table_options=None, profile=None,
+                 output_format="xlsx", destination=None, cache_dir=None,
+                 task=None, task_options=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+        self.report = report
+        self.output_format = output_format
+
+        # root of the corpus datasets for the dataset format
+        self.destination = destination
+        self.cache_dir = cache_dir
+
+        # keyword arguments for Table
+        self.table_options = dict(table_options or {})
+
+        self.profile = profile
+        if self.profile:
+            self.table_options.setdefault("profile", True)
+
+        self.task = task or run_table
+        self.task_options = task_options
+        if self.task_options is None:
+            self.task_options = {
+                "table_options": self.table_options,
+                "output_format": self.output_format,
+                "destination": self.destination,
+                "cache_dir": self.cache_dir,
+            }
+
+        self.results = []
+        self.profile_rows = []
+
+    def start_worker(self):
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(
+            target=worker,
+            args=(child_conn, self.task, self.max_tasks, self.max_memory, self.task_options),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        return {"process": process, "conn": parent_conn, "task": None, "started": 0}
+
+    def stop_worker(self, w, kill=False):
+        if kill:
+            w["process"].terminate()
+        w["process"].join()
+        w["conn"].close()
+
+    def assign(self, w, filename):
+        w["conn"].send(filename)
+        w["task"] = filename
+        w["started"] = time.perf_counter()
+
+    def record(self, result):
+        self.profile_rows.extend(result.pop("profile", []))
+        self.results.append(result)
+
+        name = os.path.basename(result["filename"])
+        print(f"[{len(self.results)}/{self.total}] {name} "
+              f"{result['status']} ({result['elapsed']:.1f}s)", flush=True)
+
+    def failure(self, w, status, error):
+        return {
+            "filename": w["task"],
+            "table_id": "",
+            "status": status,
+            "error": error,
+            "elapsed": round(time.perf_counter() - w["started"], 3),
+        }
+
+    def run(self, filenames):
+        """Processes every file and returns a list of result dicts"""
+
+        tasks = queue.Queue()
+        for filename in filenames:
+            tasks.put(filename)
+        tasks.put(None)
+
+        self.total = tasks.qsize() - 1
+        self.results = []
+        self.profile_rows = []
+
+        for result in self.imap(tasks):
+            self.record(result)
+
+        self.write_report()
+        self.write_profile()
+        return self.results
+
+    def imap(self, tasks):
+        """Yields the result of each filename in the tasks queue as it finishes
+
+        The queue ends with None. Filenames are only taken from it while a
+        worker is free, so other threads can keep filling it, and a bounded
+        queue makes them wait for the workers.
+        """
+
+        pool = []
+        idle = []
+        done = False
+
+        while True:
+            # hand out tables while there are free workers
+            while not done and (idle or len(pool) < self.workers):
+                try:
+                    filename = tasks.get_nowait()
+                except queue.Empty:
+                    break
+
+                if filename is None:
+                    done = True
+                elif idle:
+                    self.assign(idle.pop(), filename)
+                else:
+                    w = self.start_worker()
+                    pool.append(w)
+                    self.assign(w, filename)
+
+            if done:
+                for w in idle:
+                    w["conn"].send(None)
+                    self.stop_worker(w)
+                    pool.remove(w)
+                idle = []
+                if not pool:
+                    return
+
+            busy = [w for w in pool if w["task"] is not None]
+            now = time.perf_counter()
+            timeout = min([w["started"] + self.timeout - now for w in busy], default=None)
+            if not done and (idle or len(pool) < self.workers):
+                # look for more tables every POLL_INTERVAL seconds
+                timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+
+            ready = wait(
+                [w["conn"] for w in busy] + [w["process"].sentinel for w in busy],
+                timeout=None if timeout is None else max(timeout, 0)
+            )
+
+            for w in busy:
+                result = None
+                if w["conn"] in ready or (w["process"].sentinel in ready and w["conn"].poll()):
+                    # a worker that died closes its end of the pipe, which
+                    # also shows up as ready
+                    try:
+                        result = w["conn"].recv()
+                    except (EOFError, OSError):
+                        result = None
+
+                if result is not None:
+                    retire = result.pop("retire") or w["process"].sentinel in ready
+                    w["task"] = None
+                    if retire:
+                        self.stop_worker(w)
+                        pool.remove(w)
+                    else:
+                        idle.append(w)
+                elif w["conn"] in ready or w["process"].sentinel in ready:
+                    # exitcode is only set once the process is joined
+                    self.stop_worker(w)
+                    code = w["process"].exitcode
+                    result = self.failure(w, "crashed", f"worker exited with code {code}")
+                    pool.remove(w)
+                elif time.perf_counter() - w["started"] > self.timeout:
+                    self.stop_worker(w, kill=True)
+                    result = self.failure(w, "timeout", f"no result after {self.timeout}s")
+                    pool.remove(w)
+                else:
+                    continue
+
+                yield result
+
+    def write_report(self):
+        """Writes failed tables to the json report"""
+
+        if self.report:
+            write_report(self.results, self.total, self.report)
+
+    def write_profile(self):
+        """Writes the step profiles of all tables and their summary"""
+
+        if not self.profile or not self.profile_rows:
+            return
+
+        write_profile(pd.DataFrame(self.profile_rows), self.profile)
+
+
+def run_batch(directory, **kwargs):
+    """Processes every .xls file in directory"""
+
+    filenames = sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(".xls")
+    )
+
+    return BatchRunner(**kwargs).run(filenames)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape a directory of Digest tables")
+    parser.add_argument("directory", nargs="?", default="100tables/")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="seconds allowed per table")
+    parser.add_argument("--max-tasks", type=int, default=25,
+                        help="tables per worker before it is replaced")
+    parser.add_argument("--max-memory", type=float, default=None,
+                        help="MB of resident memory before a worker is replaced")
+    parser.add_argument("--report", default="failures.json",
+                        help="json file listing the failed tables")
+    parser.add_argument("--format", default="xlsx", choices=FORMATS,
+                        help="output format, csv, jsonl and parquet write a file per sheet "
+                             "and dataset appends to the corpus datasets")
+    parser.add_argument("--dataset-root", default=DATASET_ROOT,
+                        help="directory of the corpus datasets for --format dataset")
+    parser.add_argument("--dictionary", default=DICTIONARY_PATH,
+                        help="hyphen dictionary csv")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep string columns as categoricals to save memory")
+    parser.add_argument("--shared-columns", action="store_true",
+                        help="keep col_info once per table instead of once per subtable")
+    parser.add_argument("--cache", default=None,
+                        help="directory of the result cache (default: no cache)")
+    parser.add_argument("--cache-max-size", type=float, default=None,
+                        help="MB to shrink the cache to after the run")
+    parser.add_argument("--cache-max-age", type=float, default=None,
+                        help="days a cache entry may go unused")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="empty the cache before the run")
+    parser.add_argument("--profile", default=None,
+                        help="csv or json file for per-step timings of every table")
+    parser.add_argument("--no-profile-memory", action="store_true",
+                        help="only time the profiled steps, without tracing memory")
+    args = parser.parse_args()
+
+    table_options = {"dictionary_path": args.dictionary, "compact": args.compact,
+                     "shared_columns": args.shared_columns}
+    if args.no_profile_memory:
+        table_options["profile_memory"] = False
+
+    if args.cache and args.clear_cache:
+        ResultCache(args.cache).clear()
+
+    results = run_batch(
+        args.directory,
+        workers=args.workers,
+        timeout=args.timeout,
+        max_tasks=args.max_tasks,
+        max_memory=args.max_memory,
+        report=args.report,
+        table_options=table_options,
+        profile=args.profile,
+        output_format=args.format,
+        destination=args.dataset_root if args.format == "dataset" else None,
+        cache_dir=args.cache
+    )
+
+    if args.cache and (args.cache_max_size is not None or args.cache_max_age is not None):
+        ResultCache(args.cache).evict(
+            max_size=None if args.cache_max_size is None else args.cache_max_size * 1024 ** 2,
+            max_age=None if args.cache_max_age is None else args.cache_max_age * 86400
+        )
+
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results) - failed} tables written, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from generate_tables import SIZES, check_table, generate_sizes
+from table import Table
+
+# Benchmarks
+#
+# Times every pipeline stage and the whole Table construction on synthetic
+# tables of each size. Results can be saved as a csv and later runs
+# compared against it to catch regressions.
+
+
+def time_table(filename, repeats=3):
+    """Returns the median seconds of each stage over repeats runs
+
+    The "total" stage is the wall time of Table(filename).
+    """
+
+    runs = []
+
+    for _ in range(0, repeats):
+        start = time.perf_counter()
+        table = Table(filename, profile=True, profile_memory=False)
+        total = time.perf_counter() - start
+
+        profile = table.get_profile()
+        run = dict(zip(profile["step"], profile["seconds"]))
+        run["total"] = total
+        runs.append(run)
+
+    return pd.DataFrame(runs).median()
+
+
+def run_benchmark(directory, sizes=None, repeats=3, seed=0):
+    """Returns a dataframe of stage timings with one column per size"""
+
+    paths = generate_sizes(directory, sizes=sizes, seed=seed)
+    results = {}
+
+    for size, path in paths.items():
+        # the tables must reach every branch of the pipeline they stand for
+        check_table(path)
+        print(f"timing {size} ({'x'.join(map(str, SIZES[size]))})...", flush=True)
+        results[size] = time_table(path, repeats)
+
+    results = pd.DataFrame(results)
+    results.index.name = "stage"
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.01):
+    """Returns the stages that got slower than baseline by more than tolerance
+
+    Stages faster than min_seconds in both runs are ignored, their timings
+    are mostly noise.
+    """
+
+    slower = []
+
+    for size in results.columns.intersection(baseline.columns):
+        for stage in results.index.intersection(baseline.index):
+            old = baseline.loc[stage, size]
+            new = results.loc[stage, size]
+            if pd.isna(old) or pd.isna(new) or max(old, new) < min_seconds:
+                continue
+
+            if new > old * (1 + tolerance):
+                slower.append((size, stage, old, new))
+
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the Table pipeline on synthetic tables")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"],
+                        choices=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="runs per size, the median is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory", default=None,
+                        help="where the tables are written (default: a temporary directory)")
+    parser.add_argument("--output", default=None,
+                        help="csv file to save the timings to")
+    parser.add_argument("--baseline", default=None,
+                        help="csv from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown over the baseline, 0.25 is 25%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_benchmark(args.directory or tmp, sizes=args.sizes,
+                                repeats=args.repeats, seed=args.seed)
+
+    # slowest stages of the largest size first
+    results = results.sort_values(results.columns[-1], ascending=False)
+    print(results.round(4).to_string())
+
+    if args.output:
+        results.to_csv(args.output)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"{args.baseline} is missing!")
+            sys.exit(2)
+
+        baseline = pd.read_csv(args.baseline, index_col="stage")
+        slower = compare(results, baseline, args.tolerance)
+
+        for size, stage, old, new in slower:
+            print(f"{size} {stage}: {old:.4f}s -> {new:.4f}s")
+
+        if slower:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
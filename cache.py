@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import inspect
+import os
+import pickle
+import time
+from functools import lru_cache
+
+from files import write_atomic
+from hyphens import DICTIONARY_PATH
+from profiling import Profiler
+from table import Table
+
+# Result cache
+#
+# Stores the output frames of each parsed table under a key hashed from the
+# workbook's bytes, the hyphen dictionary's bytes, the pipeline version and
+# the Table options that change the output. A workbook that did not change
+# since the last run is loaded from the cache without being opened.
+#
+#   cache_dir/3f/3f9a...c1.pkl
+
+# bump to drop every cached result
+PIPELINE_VERSION = "1"
+
+# modules whose source is part of the pipeline version, so an edit to any
+# of them (for example to the cleanup rules, or to the col_info columns in
+# dataset.py) misses the old entries
+PIPELINE_MODULES = [
+    "arrays.py", "cells.py", "compact.py", "dataset.py", "footnotes.py",
+    "header.py", "hierarchy.py", "hyphens.py", "layout.py", "locations.py",
+    "normalize.py", "region.py", "steps.py", "table.py", "workbook.py", "years.py",
+]
+
+# Table options that do not change the frames
+IGNORED_OPTIONS = ["lazy", "profile", "profile_memory"]
+
+# Table options and their defaults; an option passed at its default makes
+# the same key as leaving it out
+TABLE_DEFAULTS = {
+    name: param.default
+    for name, param in inspect.signature(Table.__init__).parameters.items()
+    if param.default is not inspect.Parameter.empty
+}
+
+
+def hash_file(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_pipeline_version():
+    """Returns PIPELINE_VERSION hashed with the pipeline's source files"""
+
+    h = hashlib.sha256(PIPELINE_VERSION.encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for module in PIPELINE_MODULES:
+        with open(os.path.join(directory, module), "rb") as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+class CachedTable():
+    """The parts of a Table the batch runner uses, rebuilt from the cache"""
+
+    def __init__(self, entry, profile=False, profile_memory=True):
+        self.id = entry["id"]
+        self.year = entry["year"]
+        self.out_filename = entry["out_filename"]
+        self.frames = entry["frames"]
+        self.col_subtables = entry["col_subtables"]
+        self.profiler = Profiler(profile, profile_memory)
+
+    table_info = property(lambda self: self.frames["table_info"])
+    row_info = property(lambda self: self.frames["row_info"])
+    col_info = property(lambda self: self.frames["col_info"])
+    cell_info = property(lambda self: self.frames["cell_info"])
+    cell_values = property(lambda self: self.frames["cell_values"])
+
+    frames_for_output = Table.frames_for_output
+    get_col_info = Table.get_col_info
+    write_output = Table.write_output
+    get_profile = Table.get_profile
+
+
+class ResultCache():
+    """On-disk cache of parsed tables, keyed by content hashes"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def key(self, filename, table_options=None):
+        """Returns the cache key of a workbook parsed with table_options"""
+
+        options = {k: v for k, v in (table_options or {}).items()
+                   if k not in IGNORED_OPTIONS
+                   and not (k in TABLE_DEFAULTS and v == TABLE_DEFAULTS[k])}
+        dictionary_path = options.pop("dictionary_path", DICTIONARY_PATH)
+
+        h = hashlib.sha256()
+        h.update(hash_file(filename).encode())
+        if os.path.exists(dictionary_path):
+            h.update(hash_file(dictionary_path).encode())
+        h.update(get_pipeline_version().encode())
+        h.update(repr(sorted(options.items())).encode())
+
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """Returns the cached entry for key, or None"""
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except Exception as e:
+            print(f"{path} is unreadable, removing it: {e}")
+            self.remove(path)
+            return None
+
+        # last use, for eviction
+        os.utime(path)
+        return entry
+
+    def put(self, key, table):
+        """Stores a table's frames under key"""
+
+        entry = {
+            "id": table.id,
+            "year": getattr(table, "year", None),
+            "out_filename": table.out_filename,
+            "frames": {name: getattr(table, name)
+                       for name in ["table_info", "row_info", "col_info", "cell_info",
+                                    "cell_values"]},
+            "col_subtables": table.col_subtables,
+        }
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # readers never see half an entry
+        write_atomic(path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_table(self, filename, table_options=None):
+        """Returns the table for filename, parsing it only on a cache miss"""
+
+        table_options = table_options or {}
+        key = self.key(filename, table_options)
+
+        entry = self.get(key)
+        if entry is not None:
+            return CachedTable(entry, table_options.get("profile", False),
+                               table_options.get("profile_memory", True))
+
+        table = Table(filename, **table_options)
+        self.put(key, table)
+        return table
+
+    def invalidate(self, filename, table_options=None):
+        """Removes the entry for a workbook, returns True if there was one"""
+
+        path = self.path(self.key(filename, table_options))
+        if os.path.exists(path):
+            self.remove(path)
+            return True
+        return False
+
+    def entries(self):
+        """Returns (path, size, last used) for every entry"""
+
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def evict(self, max_size=None, max_age=None):
+        """Removes entries unused for max_age seconds, then the least recently
+        used ones until the cache is under max_size bytes
+
+        Returns the number of entries removed.
+        """
+
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        removed = 0
+
+        if max_age is not None:
+            cutoff = time.time() - max_age
+            while entries and entries[0][2] < cutoff:
+                self.remove(entries.pop(0)[0])
+                removed += 1
+
+        if max_size is not None:
+            total = sum(e[1] for e in entries)
+            while entries and total > max_size:
+                path, size, _ = entries.pop(0)
+                self.remove(path)
+                total -= size
+                removed += 1
+
+        return removed
+
+    def clear(self):
+        """Removes every entry"""
+
+        entries = self.entries()
+        for path, _, _ in entries:
+            self.remove(path)
+        return len(entries)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evict or invalidate cached tables")
+    parser.add_argument("cache_dir")
+    parser.add_argument("--clear", action="store_true",
+                        help="remove every entry")
+    parser.add_argument("--invalidate", nargs="+", default=[], metavar="XLS",
+                        help="remove the entries for these workbooks")
+    parser.add_argument("--dictionary", default=DICTIONARY_PATH,
+                        help="hyphen dictionary the entries were made with")
+    parser.add_argument("--compact", action="store_true",
+                        help="the entries were made with --compact")
+    parser.add_argument("--shared-columns", action="store_true",
+                        help="the entries were made with --shared-columns")
+    parser.add_argument("--max-size", type=float, default=None,
+                        help="MB to shrink the cache to, least recently used first")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="days an entry may go unused")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache_dir)
+
+    if args.clear:
+        print(f"{cache.clear()} entries removed")
+
+    for filename in args.invalidate:
+        table_options = {"dictionary_path": args.dictionary, "compact": args.compact,
+                         "shared_columns": args.shared_columns}
+        if not cache.invalidate(filename, table_options):
+            print(f"{filename} is not cached")
+
+    if args.max_size is not None or args.max_age is not None:
+        removed = cache.evict(
+            max_size=None if args.max_size is None else args.max_size * 1024 ** 2,
+            max_age=None if args.max_age is None else args.max_age * 86400
+        )
+        print(f"{removed} entries evicted")
+
+
+if __name__ == "__main__":
+    main()
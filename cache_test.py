@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from batch import BatchRunner
+from cache import ResultCache
+from generate_tables import generate_table
+from hyphens import DICTIONARY_PATH
+
+# The result cache as batch.py and the cache.py command line use it
+
+CACHE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache.py")
+
+# the options batch.py passes without flags
+BATCH_OPTIONS = {"dictionary_path": DICTIONARY_PATH, "compact": False, "shared_columns": False}
+
+
+def entries(cache_dir):
+    return [path for path, _, _ in ResultCache(cache_dir).entries()]
+
+
+def test_options_at_their_defaults_make_the_same_key(tmp_path):
+    filename = generate_table(str(tmp_path / "tabn900.10.xls"))
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    assert cache.key(filename, BATCH_OPTIONS) == cache.key(filename, {})
+    assert cache.key(filename, {"compact": True}) != cache.key(filename, {})
+
+
+def test_entry_written_by_batch_is_invalidated_from_the_command_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    filename = generate_table(str(tmp_path / "tabn900.10.xls"))
+    cache_dir = str(tmp_path / "cache")
+
+    results = BatchRunner(workers=1, report=None, table_options=BATCH_OPTIONS,
+                          output_format="csv", cache_dir=cache_dir).run([filename])
+    assert [r["status"] for r in results] == ["ok"]
+    assert len(entries(cache_dir)) == 1
+
+    done = subprocess.run([sys.executable, CACHE_SCRIPT, cache_dir, "--invalidate", filename],
+                          capture_output=True, text=True, check=True)
+
+    assert "not cached" not in done.stdout
+    assert entries(cache_dir) == []
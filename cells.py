@@ -0,0 +1,162 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from arrays import map_unique
+from compact import compact_frame
+from footnotes import REFERENCE
+
+# Numeric cell values
+#
+# Data cells reach row_info as the text of the sheet: "12.5\1\", "(0.42)",
+# "‡", "---" or "4,512!". cell_values holds the same cells in long form,
+# one row per (subtable, row, column), parsed once per distinct string:
+#
+#   row_index            int, the row_index of row_info
+#   value                float64, missing for symbols and text
+#   standard_error       float64, the value of the paired standard error cell
+#   flag                 the symbols of the cell, like "!" or "‡", or "text",
+#                        and "()" for a number in parentheses
+#   standard_error_flag  the symbols of the paired standard error cell
+#   footnote_ids         the footnotes the cell and its standard error
+#                        reference, like "1,2"
+#
+# Blank cells are left out. A standard error column gets no rows of its
+# own, its cells are stored in the row of their estimate, which is kept
+# when only the standard error is filled in. Parentheses only mark standard
+# errors in the columns DataRegion pairs with an estimate, anywhere else
+# "(2.5)" is a negative number, like a fall in a change column.
+
+# cells that stand for a missing value, alone or in parentheses
+SYMBOLS = ["---", "—", "(---)", "(—)", "†", "(†)", "‡", "(‡)", "#", "(#)"]
+
+# marks after a value
+SUFFIXES = ["!", "*"]
+
+NUMBER = re.compile(r"^(\()?\s*([-+]?\$?(?:\d[\d,]*)?\.?\d+(?:[eE][-+]?\d+)?)\s*%?\s*(\))?$")
+
+# label columns copied from row_info, row_index is kept as a number
+LABEL_COLUMNS = ["digest_table_id", "digest_table_year", "digest_table_sub_id"]
+
+
+def parse_cell(text, refs):
+    """Returns (value, in_parentheses, flag, footnote_ids) for a cell string
+
+    refs is the table's FootnoteIndex. value is the number as written, the
+    caller decides what parentheses around it mean.
+    """
+
+    footnote_ids = ",".join(refs.get_refs(text))
+    text = REFERENCE.sub("", text).strip()
+
+    flags = []
+    while text and text[-1] in SUFFIXES:
+        flags.insert(0, text[-1])
+        text = text[:-1].rstrip()
+
+    value, in_parentheses = np.nan, False
+
+    if text in SYMBOLS:
+        flags.insert(0, text.strip("()"))
+    elif text != "":
+        res = NUMBER.match(text)
+        if res and bool(res.group(1)) == bool(res.group(3)):
+            value = float(res.group(2).replace(",", "").replace("$", ""))
+            in_parentheses = bool(res.group(1))
+        else:
+            flags.insert(0, "text")
+
+    return value, in_parentheses, "".join(flags), footnote_ids
+
+
+def parse_cells(cells, refs):
+    """Returns the value, in_parentheses, flag and footnote_ids arrays of an
+    array of cell strings, parsing each distinct string once"""
+
+    return map_unique(cells, lambda text: parse_cell(text, refs),
+                      dtype=[np.float64, bool, object, object])
+
+
+def join_ids(*ids):
+    """Returns comma separated footnote ids joined, each id once"""
+
+    numbers = [n for i in ids for n in i.split(",") if n != ""]
+    return ",".join(dict.fromkeys(numbers))
+
+
+def build_cell_values(row_info, data_columns, refs, estimates=None):
+    """Returns the cell_values frame of the data columns of row_info
+
+    estimates gives, for each standard error column, the position of its
+    estimate column (-1 for the others, see DataRegion). Standard errors,
+    their flags and footnotes are stored in the rows of their estimates
+    and those columns get no rows.
+    """
+
+    data = row_info.loc[:, data_columns]
+    shape = data.shape
+
+    # every data cell, row by row
+    cells = np.array(["" if pd.isna(v) else str(v).strip()
+                      for v in data.to_numpy(dtype=object).ravel()], dtype=object)
+    value, in_parentheses, flag, footnote_ids = parse_cells(cells, refs)
+
+    value = value.reshape(shape)
+    in_parentheses = in_parentheses.reshape(shape)
+    flag = flag.reshape(shape)
+    footnote_ids = footnote_ids.reshape(shape)
+
+    keep = (cells != "").reshape(shape)
+    standard_error = np.full(shape, np.nan)
+    standard_error_flag = np.full(shape, "", dtype=object)
+
+    if estimates is None:
+        estimates = np.full(shape[1], -1)
+    estimates = np.asarray(estimates)
+
+    # outside standard error columns a number in parentheses is negative
+    negative = in_parentheses & (estimates < 0)[np.newaxis, :]
+    value[negative] = -value[negative]
+    flag[negative] = "()" + flag[negative]
+
+    for c in np.flatnonzero(estimates >= 0):
+        e = estimates[c]
+        filled = keep[:, c]
+
+        # with or without parentheses
+        standard_error[filled, e] = value[filled, c]
+        standard_error_flag[:, e] = flag[:, c]
+
+        for r in np.flatnonzero(footnote_ids[:, c] != ""):
+            footnote_ids[r, e] = join_ids(footnote_ids[r, e], footnote_ids[r, c])
+
+        keep[:, e] |= filled
+        keep[:, c] = False
+
+    value = value.ravel()
+    standard_error = standard_error.ravel()
+    flag = flag.ravel()
+    footnote_ids = footnote_ids.ravel()
+    keep = keep.ravel()
+    standard_error_flag = standard_error_flag.ravel()
+    cell = np.flatnonzero(keep)
+    rows = cell // shape[1]
+    cols = cell % shape[1]
+
+    labels = row_info[LABEL_COLUMNS].astype(str).to_numpy(dtype=object)[rows]
+    row_index = row_info["row_index"].to_numpy(dtype=object).astype(np.int64)[rows]
+
+    df = pd.DataFrame({
+        **{col: labels[:, i] for i, col in enumerate(LABEL_COLUMNS)},
+        "row_index": row_index,
+        "column_index": np.asarray(data_columns, dtype=object)[cols],
+        "value": value[keep],
+        "standard_error": standard_error[keep],
+        "flag": flag[keep],
+        "standard_error_flag": standard_error_flag[keep],
+        "footnote_ids": footnote_ids[keep],
+    })
+
+    # labels, flags and footnote ids repeat, store them once
+    return compact_frame(df)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# Compact frames
+#
+# Most result columns repeat a few strings on every row (table id, year,
+# subtitle, is_total, footnote text). Stored as categoricals, each distinct
+# string is kept once and the rows hold small integer codes.
+
+
+def recode(codes, labels):
+    """Returns a Categorical of labels[codes], -1 codes are missing
+
+    labels may repeat, equal labels share one category.
+    """
+
+    label_codes, categories = pd.factorize(np.asarray(labels, dtype=object))
+    codes = np.asarray(codes)
+
+    new_codes = np.where(codes >= 0, label_codes[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(new_codes, categories=categories)
+
+
+def to_string_category(series):
+    """Returns series.astype(str) as a Categorical, converting each value once"""
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = series.cat.categories.astype(str)
+        return recode(series.cat.codes.to_numpy(), labels)
+
+    # missing values are kept as a value so they become "nan" like astype(str)
+    codes, uniques = pd.factorize(series.to_numpy(), use_na_sentinel=False)
+    labels = pd.Series(uniques).astype(str)
+    return recode(codes, labels)
+
+
+def compact_frame(df):
+    """Returns df with its string columns stored as categoricals"""
+
+    df = df.copy()
+
+    for i, dtype in enumerate(df.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(dtype):
+            continue
+
+        codes, uniques = pd.factorize(df.iloc[:, i].to_numpy(dtype=object))
+        df.isetitem(i, recode(codes, uniques))
+
+    return df
+
+
+def release_frame(df):
+    """Returns df with categorical columns back as object columns
+
+    Used before setting values that are not categories yet.
+    """
+
+    df = df.copy()
+
+    for i, dtype in enumerate(df.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype):
+            df.isetitem(i, df.iloc[:, i].to_numpy(dtype=object))
+
+    return df
@@ -0,0 +1,170 @@
+import os
+import shutil
+
+from workbook import COLUMN_LETTERS
+
+# Corpus-wide datasets
+#
+# Every table's output frames are appended to one parquet dataset each under
+# one root, partitioned by digest_table_year and digest_table_id:
+#
+#   root/column_info/digest_table_year=2019/digest_table_id=203.10/part-0.parquet
+#
+# Each dataset has a fixed schema so tables can be read together. All
+# columns are strings, the way convert_to_string leaves the frames, except
+# the numbers of cell_values, and columns a table does not have are null.
+
+KEY_COLUMNS = ['digest_table_id', 'digest_table_year', 'digest_table_sub_id', 'digest_table_sub_title']
+
+PARTITION_COLUMNS = ['digest_table_year', 'digest_table_id']
+
+DATASET_ROOT = "output/dataset"
+
+TABLE_INFO_COLUMNS = KEY_COLUMNS + [
+    'digest_table_sub_title_note', 'has_SE', 'location_in', 'year_in', 'year', 'location',
+    'location_type', 'table_title', 'headnote', 'stub_head', 'general_note', 'source_note',
+    'last_prepared'
+]
+
+# data columns of row_info are named like column_index, A to ZZ. Standard
+# error columns count as data columns, so state tables get wide.
+ROW_INFO_COLUMNS = KEY_COLUMNS + ['row_index'] + [
+    f"row_{kind}_{level}" for level in range(1, 8) for kind in ["level", "ref_note"]
+] + ['is_total', 'year', 'location', 'location_type'] + COLUMN_LETTERS
+
+COLUMN_INFO_COLUMNS = KEY_COLUMNS + [
+    'column_index', 'is_standard_error', 'paired_column_index', 'is_dollar', 'format_string',
+    'year', 'location', 'location_type',
+    'column_level_1', 'column_level_2', 'column_level_3', 'column_level_4', 'column_level_5',
+    'column_level_6', 'column_level_7', 'column_ref_note_1', 'column_ref_note_2', 'column_ref_note_3',
+    'column_ref_note_4', 'column_ref_note_5', 'column_ref_note_6', 'column_ref_note_7'
+]
+
+CELL_INFO_COLUMNS = KEY_COLUMNS + [
+    'is_standard_error', 'is_dollar', 'format_string', 'row_index', 'column_index', 'cell_note'
+]
+
+CELL_VALUE_COLUMNS = [
+    'digest_table_id', 'digest_table_year', 'digest_table_sub_id', 'row_index', 'column_index',
+    'value', 'standard_error', 'flag', 'standard_error_flag', 'footnote_ids'
+]
+
+# columns of each dataset stored as numbers, see cells.py
+NUMBER_TYPES = {
+    "cell_values": {"row_index": "int64", "value": "float64", "standard_error": "float64"},
+}
+
+# sheet name and columns of each dataset
+SCHEMAS = {
+    "table_info": TABLE_INFO_COLUMNS,
+    "row_info": ROW_INFO_COLUMNS,
+    "column_info": COLUMN_INFO_COLUMNS,
+    "cell_info": CELL_INFO_COLUMNS,
+    "cell_values": CELL_VALUE_COLUMNS,
+}
+
+
+def get_schema(sheet_name):
+    import pyarrow as pa
+
+    types = NUMBER_TYPES.get(sheet_name, {})
+    return pa.schema([(col, pa.type_for_alias(types.get(col, "string")))
+                      for col in SCHEMAS[sheet_name]])
+
+
+def get_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(
+        pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS]), flavor="hive")
+
+
+def conform(df, sheet_name):
+    """Returns df with exactly the dataset's columns, in schema order
+
+    Raises ValueError if df has columns the schema does not.
+    """
+
+    columns = SCHEMAS[sheet_name]
+
+    extra = [col for col in df.columns if col not in set(columns)]
+    if extra:
+        raise ValueError(f"{sheet_name} columns not in the dataset schema: {extra}")
+
+    df = df.reindex(columns=columns)
+    return df.astype(object).where(df.notna(), None)
+
+
+class DatasetWriter():
+    """Appends a table's sheets to the partitioned datasets under root
+
+    Writing a table again replaces its partitions, so reruns and tables
+    processed by different workers never collide. An empty sheet writes
+    nothing, so its partition from an earlier run is deleted instead, for
+    the table of the sheets written before it.
+    """
+
+    def __init__(self, root):
+        import pyarrow  # noqa: F401
+
+        self.root = root
+        self.filenames = []
+
+        # partition values of the table, from the first sheet with rows
+        self.partition = None
+
+    def partition_path(self, sheet_name):
+        return os.path.join(self.root, sheet_name, *[
+            f"{col}={value}" for col, value in zip(PARTITION_COLUMNS, self.partition)])
+
+    def write_sheet(self, sheet_name, df):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if df.shape[0] == 0:
+            if self.partition is None:
+                print(f"{sheet_name} is empty and its table is unknown, "
+                      f"old partitions are kept")
+            else:
+                shutil.rmtree(self.partition_path(sheet_name), ignore_errors=True)
+            return
+
+        df = conform(df, sheet_name)
+        if self.partition is None:
+            self.partition = tuple(str(df[col].iloc[0]) for col in PARTITION_COLUMNS)
+
+        table = pa.Table.from_pandas(df, schema=get_schema(sheet_name), preserve_index=False)
+
+        path = os.path.join(self.root, sheet_name)
+        ds.write_dataset(
+            table,
+            path,
+            format="parquet",
+            partitioning=get_partitioning(),
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="delete_matching",
+            file_visitor=lambda f: self.filenames.append(f.path)
+        )
+
+    def close(self):
+        pass
+
+
+def read_dataset(root, sheet_name, years=None, table_ids=None, columns=None):
+    """Returns one dataset as a dataframe, read only for the given tables"""
+
+    import pyarrow.dataset as ds
+
+    schema = get_schema(sheet_name)
+    dataset = ds.dataset(os.path.join(root, sheet_name), schema=schema,
+                         format="parquet", partitioning=get_partitioning())
+
+    expression = None
+    for col, values in [("digest_table_year", years), ("digest_table_id", table_ids)]:
+        if values is None:
+            continue
+        condition = ds.field(col).isin([str(v) for v in values])
+        expression = condition if expression is None else expression & condition
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
@@ -1,10 +1,215 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from files import write_atomic
+
+# Downloads the Digest tables in table_list.csv
+#
+# Files are fetched in parallel over one pooled session, with retries and
+# backoff. A manifest in the output directory keeps each file's ETag and
+# Last-Modified, so later runs send conditional requests and skip files
+# that did not change. Files are written to a temporary name and renamed,
+# and error pages are never saved as .xls.
+
+BASE_URL = "https://nces.ed.gov/programs/digest/d19/tables/xls/"
+
+MANIFEST = "manifest.json"
+
+# first bytes of an OLE2 compound file, which .xls workbooks are
+XLS_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+class DownloadError(Exception):
+    """Raised when a response is not a workbook"""
+
+
+def read_table_list(filename="table_list.csv"):
+    """Returns the table numbers, as strings so 203.10 keeps its zero"""
+
+    df = pd.read_csv(filename, header=None, names=["tables"], dtype=str)
+    return [tab.strip() for tab in df.tables.dropna()]
+
+
+def make_session(workers=8, retries=5, backoff=0.5):
+    """Returns a session pooling workers connections, retrying failed GETs"""
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Downloader():
+    """Downloads tables from base_url into directory, only when they changed"""
+
+    def __init__(self, base_url=BASE_URL, directory="100tables/", workers=8,
+                 timeout=60, retries=5, backoff=0.5, force=False):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.directory = directory
+        self.workers = workers
+        self.timeout = timeout
+        self.force = force
+
+        self.session = make_session(workers, retries, backoff)
+
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.manifest = self.load_manifest()
+        self.lock = threading.Lock()
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except ValueError:
+            print(f"{self.manifest_path} is unreadable, downloading every table")
+            return {}
+
+    def save_manifest(self):
+        write_atomic(self.manifest_path,
+                     json.dumps(self.manifest, indent=2, sort_keys=True).encode())
+
+    def get_url(self, tab):
+        return f"{self.base_url}tabn{tab}.xls"
+
+    def get_filename(self, tab):
+        return os.path.join(self.directory, f"tabn{tab}.xls")
+
+    def get_headers(self, tab):
+        """Returns the conditional request headers for a table we already have"""
+
+        entry = self.manifest.get(tab)
+        if self.force or not entry or not os.path.exists(self.get_filename(tab)):
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def download(self, tab):
+        """Fetches one table and returns its status
+
+        "downloaded", "unchanged" or "error", with the error message.
+        """
+
+        url = self.get_url(tab)
+
+        try:
+            with self.session.get(url, headers=self.get_headers(tab),
+                                  timeout=self.timeout, stream=True) as r:
+                if r.status_code == 304:
+                    return "unchanged", ""
+
+                if r.status_code != 200:
+                    raise DownloadError(f"HTTP {r.status_code}")
+
+                content = r.content
+                check_workbook(content, r.headers.get("Content-Type", ""))
+
+                write_atomic(self.get_filename(tab), content)
+
+                entry = {
+                    "url": url,
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "sha256": hashlib.sha256(content).hexdigest(),
+                    "size": len(content),
+                    "downloaded": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                }
+        except (requests.RequestException, DownloadError) as e:
+            return "error", f"{url}: {e}"
+
+        with self.lock:
+            self.manifest[tab] = entry
+        return "downloaded", ""
+
+    def run(self, tables):
+        """Downloads every table and returns {table: (status, error)}"""
+
+        os.makedirs(self.directory, exist_ok=True)
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.download, tab): tab for tab in tables}
+
+            for future in as_completed(futures):
+                tab = futures[future]
+                results[tab] = future.result()
+
+                status, error = results[tab]
+                if status == "error":
+                    print(error, flush=True)
+
+        self.save_manifest()
+        return results
+
+
+def check_workbook(content, content_type=""):
+    """Raises DownloadError if content is an html page instead of a workbook"""
+
+    start = content[:512].lstrip().lower()
+
+    if "html" in content_type.lower() or start.startswith((b"<!doctype", b"<html", b"<?xml")):
+        raise DownloadError("got an html page instead of a workbook")
+    if not content.startswith(XLS_SIGNATURE):
+        raise DownloadError("response is not an .xls workbook")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download the Digest tables in a table list")
+    parser.add_argument("--list", default="table_list.csv",
+                        help="csv with one table number per line")
+    parser.add_argument("--directory", default="100tables/")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--workers", type=int, default=8,
+                        help="parallel downloads")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="seconds to wait for a response")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--force", action="store_true",
+                        help="download every table even if it did not change")
+    args = parser.parse_args()
+
+    downloader = Downloader(
+        base_url=args.base_url,
+        directory=args.directory,
+        workers=args.workers,
+        timeout=args.timeout,
+        retries=args.retries,
+        force=args.force
+    )
+    results = downloader.run(read_table_list(args.list))
 
-df = pd.read_csv('table_list.csv', header=None, names=['tables'])
+    statuses = [status for status, _ in results.values()]
+    print(f"{statuses.count('downloaded')} downloaded, {statuses.count('unchanged')} unchanged, "
+          f"{statuses.count('error')} failed")
 
 
-for tab in df.tables:
-    url = 'https://nces.ed.gov/programs/digest/d19/tables/xls/tabn' + tab + '.xls'
-    r = requests.get(url)
-    open('100tables/tabn' + tab + '.xls', 'wb').write(r.content)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
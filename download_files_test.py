@@ -0,0 +1,105 @@
+import json
+import os
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from download_files import MANIFEST, XLS_SIGNATURE, Downloader
+
+# Runs the downloader against a local server:
+#
+#   tabn1.xls  a workbook with an ETag, 304 when the ETag is sent back
+#   tabn2.xls  404
+#   tabn3.xls  an html page served with status 200
+
+WORKBOOK = XLS_SIGNATURE + b"\0" * 504
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+
+        if self.path.endswith("tabn1.xls"):
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_body(200, WORKBOOK, "application/vnd.ms-excel", {"ETag": ETAG})
+        elif self.path.endswith("tabn3.xls"):
+            self.send_body(200, b"<!DOCTYPE html><html>Page not found</html>", "text/html")
+        else:
+            self.send_body(404, b"not found", "text/plain")
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield httpd
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_downloader(server, directory):
+    host, port = server.server_address
+    return Downloader(base_url=f"http://{host}:{port}/", directory=str(directory),
+                      workers=2, retries=0)
+
+
+def test_download_and_errors(server, tmp_path):
+    results = make_downloader(server, tmp_path).run(["1", "2", "3"])
+
+    assert results["1"] == ("downloaded", "")
+    assert results["2"][0] == "error" and "HTTP 404" in results["2"][1]
+    assert results["3"][0] == "error" and "html" in results["3"][1]
+
+    with open(tmp_path / "tabn1.xls", "rb") as f:
+        assert f.read() == WORKBOOK
+
+    # error pages are never saved, and no temporary files are left over
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST, "tabn1.xls"]
+
+    with open(tmp_path / MANIFEST) as f:
+        manifest = json.load(f)
+    assert list(manifest) == ["1"]
+    assert manifest["1"]["etag"] == ETAG
+    assert manifest["1"]["size"] == len(WORKBOOK)
+
+
+def test_unchanged_table_is_not_downloaded_again(server, tmp_path):
+    make_downloader(server, tmp_path).run(["1"])
+    results = make_downloader(server, tmp_path).run(["1"])
+
+    assert results["1"] == ("unchanged", "")
+    assert server.requests[-1] == ("/tabn1.xls", ETAG)
+
+
+def test_files_follow_the_umask(server, tmp_path):
+    umask = os.umask(0o027)
+    try:
+        make_downloader(server, tmp_path).run(["1"])
+    finally:
+        os.umask(umask)
+
+    for name in ["tabn1.xls", MANIFEST]:
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) == 0o640
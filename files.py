@@ -0,0 +1,30 @@
+import os
+import secrets
+
+# File helpers
+
+
+def write_atomic(filename, content):
+    """Writes content to a temporary file next to filename, then renames it
+
+    Readers see either the old file or the whole new one. The temporary
+    file is created with mode 0666 like open() does, so the umask applies.
+    """
+
+    directory = os.path.dirname(filename) or "."
+
+    while True:
+        tmp = os.path.join(directory, f".{os.path.basename(filename)}.{secrets.token_hex(6)}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,86 @@
+import re
+
+from arrays import map_unique
+
+# Footnote references
+#
+# Labels and cells reference the footnotes below a table as \1\, or as
+# \1,2\ and \1,2,3\ for several at once. FootnoteIndex finds the references
+# of each distinct string once and serves the footnote numbers, the joined
+# note text and the label without references from that.
+
+REFERENCE = re.compile(r"\\([0-9]+(?:,[0-9]+)*),?\\")
+
+# joins the notes of a label that references more than one footnote
+NOTE_SEPARATOR = ":::"
+
+
+def find_refs(value):
+    """Returns the footnote numbers referenced in value, in order"""
+
+    numbers = []
+    for group in REFERENCE.findall(value):
+        numbers.extend(group.split(","))
+    return tuple(numbers)
+
+
+class FootnoteIndex():
+    """Footnote numbers referenced by each string of a table
+
+    Built from the footnotes dict ({"1": "text", ...}) and the sheet's
+    values. Strings made later, like header lines joined together, are
+    indexed the first time they are looked up.
+    """
+
+    def __init__(self, footnotes, values=()):
+        self.footnotes = footnotes
+        self.refs = {}
+        self.add(values)
+
+    def add(self, values):
+        """Indexes every string in values"""
+
+        for value in set(values):
+            if isinstance(value, str) and value not in self.refs:
+                self.refs[value] = find_refs(value)
+
+    def get_refs(self, value):
+        """Returns the footnote numbers value references"""
+
+        if not isinstance(value, str):
+            return ()
+        if value not in self.refs:
+            self.refs[value] = find_refs(value)
+        return self.refs[value]
+
+    def get_texts(self, value):
+        """Returns the footnote texts value references, a number when the
+        footnote is missing"""
+
+        return [self.footnotes.get(n, n) for n in self.get_refs(value)]
+
+    def get_note(self, value):
+        return NOTE_SEPARATOR.join(self.get_texts(value))
+
+    def strip(self, value):
+        """Returns value without its footnote references"""
+
+        if not self.get_refs(value):
+            return value.strip()
+        return REFERENCE.sub("", value).strip()
+
+    def split(self, value):
+        """Returns (label, note) for a header or stub label"""
+
+        return self.strip(value), self.get_note(value)
+
+    def split_values(self, values):
+        """Returns (labels, notes) arrays for an array of strings, splitting
+        each distinct string once"""
+
+        return map_unique(values, self.split, dtype=[object, object])
+
+    def notes(self, values):
+        """Returns the note of each value, looking each distinct value up once"""
+
+        return map_unique(values, self.get_note, missing="")
@@ -0,0 +1,226 @@
+import argparse
+import os
+import random
+
+import xlwt
+
+from table import Table
+
+# Synthetic Digest tables
+#
+# Writes .xls files laid out like the Digest of Education Statistics
+# tables Table parses: title, bracketed headnote, stub head and column
+# headings, a row numbering the columns from 1, bold and indented stubs,
+# totals over a double border, \1\ footnote markers, ---/†/‡/! symbols,
+# and footnote, NOTE and SOURCE lines under a single border.
+
+# (groups, subgroups, years) per size
+SIZES = {
+    "small": (3, 2, 4),
+    "medium": (15, 5, 6),
+    "large": (60, 8, 10),
+    "xlarge": (150, 10, 12),
+}
+
+SYMBOLS = ["---", "†", "‡"]
+
+NOTES = [
+    "---Not available.",
+    "†Not applicable.",
+    "‡Reporting standards not met (too few cases for a reliable estimate).",
+    "!Interpret data with caution. The coefficient of variation (CV) for this estimate is between 30 and 50 percent.",
+    "\\1\\Includes imputations for nonreporting schools.",
+    "\\2\\Excludes students enrolled in ungraded programs.",
+    "NOTE: Detail may not sum to totals because of rounding.",
+    "SOURCE: U.S. Department of Education, National Center for Education Statistics, "
+    "Common Core of Data (CCD). (This table was prepared May 2019.)",
+]
+
+
+class TableWriter():
+    """Writes one synthetic Digest table to a worksheet"""
+
+    def __init__(self, groups=3, subgroups=2, years=4, standard_errors=True,
+                 subtables=True, footnote_columns=True, seed=0):
+        self.groups = groups
+        self.subgroups = subgroups
+        self.years = [str(1990 + 5 * i) for i in range(years)]
+        self.standard_errors = standard_errors
+        self.subtables = subtables
+        self.footnote_columns = footnote_columns
+        self.rnd = random.Random(seed)
+
+        self.plain = xlwt.easyxf("")
+        self.bold = xlwt.easyxf("font: bold on")
+        self.total = xlwt.easyxf("font: bold on; borders: bottom double")
+        self.double = xlwt.easyxf("borders: bottom double")
+        self.end = xlwt.easyxf("borders: top thin")
+
+        # value, standard error and footnote column of each year
+        self.columns = []
+        col = 1
+        for year in self.years:
+            se_col = col + 1 if standard_errors else None
+            note_col = (se_col or col) + 1 if footnote_columns else None
+            self.columns.append((year, col, se_col, note_col))
+            col = max(c for c in (col, se_col, note_col) if c is not None) + 1
+
+        self.ncols = col
+
+    def write(self, number):
+        self.ws.write(0, 0, f"Table {number}. Enrollment in public elementary and "
+                            f"secondary schools, by level and grade: Selected years, "
+                            f"{self.years[0]} through {self.years[-1]}")
+
+        if self.standard_errors:
+            self.ws.write(1, 0, "[Standard errors appear in parentheses]")
+        else:
+            self.ws.write(1, 0, "[In thousands]")
+
+        row = self.write_header(2)
+        row = self.write_data(row)
+        self.write_notes(row)
+
+    def write_header(self, row):
+        self.ws.write(row, 0, "Level and grade")
+
+        for i, (year, col, se_col, note_col) in enumerate(self.columns):
+            heading = "Total enroll-\nment\\1\\" if i == 0 else "Public"
+            self.ws.write(row, col, heading)
+            self.ws.write(row + 1, col, year)
+            if se_col is not None:
+                self.ws.write(row, se_col, heading)
+                self.ws.write(row + 1, se_col, year)
+
+        # column numbers
+        for col in range(0, self.ncols):
+            self.ws.write(row + 2, col, col + 1)
+
+        return row + 3
+
+    def write_data(self, row):
+        subtables = ["Number", "Percent\\2\\"] if self.subtables else [None]
+
+        for subtable in subtables:
+            if subtable is not None:
+                self.ws.write(row, 1, subtable)
+                row += 1
+
+            # totals are bold and indented 3 spaces, see build_row_levels
+            self.ws.write(row, 0, "   Total, all students", self.total)
+            self.write_values(row, self.double, total=True)
+            row += 1
+
+            for g in range(0, self.groups):
+                label = f"Group {g}\\1\\" if g == 0 else f"Group {g}"
+                self.ws.write(row, 0, label, self.bold)
+                self.write_values(row, self.plain)
+                row += 1
+
+                for s in range(0, self.subgroups):
+                    label = f"  Subgroup {s}"
+                    if s == 1:
+                        label += "\\1,2\\"
+                    self.ws.write(row, 0, label)
+                    self.write_values(row, self.plain)
+                    row += 1
+
+        return row
+
+    def write_values(self, row, style, total=False):
+        rnd = self.rnd
+
+        for year, col, se_col, note_col in self.columns:
+            if total:
+                value = f"{rnd.randint(1000, 90000):,}"
+            else:
+                value = rnd.choice([f"{rnd.uniform(1, 99):.1f}"] * 4 + SYMBOLS
+                                   + [f"{rnd.uniform(1, 99):.1f}!"])
+            self.ws.write(row, col, value, style)
+
+            if se_col is not None:
+                se = "(†)" if value in SYMBOLS else f"({rnd.random():.2f})"
+                self.ws.write(row, se_col, se, style)
+
+            if note_col is not None:
+                note = "\\2\\" if not total and rnd.random() < 0.2 else ""
+                self.ws.write(row, note_col, note, style)
+
+    def write_notes(self, row):
+        for col in range(0, self.ncols):
+            self.ws.write(row, col, "", self.end)
+
+        for i, note in enumerate(NOTES):
+            self.ws.write(row + 1 + i, 0, note)
+
+    def save(self, path, number, year=2019):
+        wb = xlwt.Workbook(encoding="utf-8")
+        self.ws = wb.add_sheet(f"Digest {year} Table {number}")
+        self.write(number)
+        wb.save(path)
+
+
+def generate_table(path, number="203.10", **kwargs):
+    """Writes a synthetic Digest table to path, see TableWriter for options"""
+
+    TableWriter(**kwargs).save(path, number)
+    return path
+
+
+def check_table(path):
+    """Parses a generated table and raises AssertionError if it lacks the
+    parts the generator is meant to exercise"""
+
+    table = Table(path)
+
+    assert (table.row_info["is_total"] == "TRUE").any(), f"{path} has no total rows"
+    assert (table.row_info["is_total"] == "FALSE").any(), f"{path} has only total rows"
+    assert table.cell_info.shape[0] > 0, f"{path} has no cell notes"
+
+    return table
+
+
+def generate_sizes(directory, sizes=None, seed=0, **kwargs):
+    """Writes one table per size and returns {size: path}"""
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+
+    for i, size in enumerate(sizes or SIZES):
+        groups, subgroups, years = SIZES[size]
+        number = f"900.{i + 1}0"
+        path = os.path.join(directory, f"tabn{number}.xls")
+        paths[size] = generate_table(path, number, groups=groups, subgroups=subgroups,
+                                     years=years, seed=seed, **kwargs)
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write synthetic Digest tables")
+    parser.add_argument("directory", nargs="?", default="synthetic/")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-standard-errors", action="store_true")
+    parser.add_argument("--no-subtables", action="store_true")
+    parser.add_argument("--check", action="store_true",
+                        help="parse each table and check it has totals and notes")
+    args = parser.parse_args()
+
+    paths = generate_sizes(
+        args.directory,
+        sizes=args.sizes,
+        seed=args.seed,
+        standard_errors=not args.no_standard_errors,
+        subtables=not args.no_subtables
+    )
+
+    for size, path in paths.items():
+        if args.check:
+            check_table(path)
+        print(f"{size}: {path}")
+
+
+if __name__ == "__main__":
+    main()
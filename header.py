@@ -0,0 +1,114 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from arrays import map_unique
+from hierarchy import blank_repeats
+from workbook import column_letter
+
+# Column header parsing
+
+ELLIPSIS = re.compile(r"\.\.+")
+YEAR_FLOAT = re.compile(r"^(\d{4})\.0$")
+
+
+def merge_continuation_rows(header):
+    """Returns header with wrapped header lines joined to the line above
+
+    A row continues the one above when every cell it has text in sits
+    under a cell with text and starts in lowercase, like a long heading
+    split over two sheet rows (217.15).
+    """
+
+    values = header.to_numpy(dtype=object)
+    filled = np.array([isinstance(v, str) and v.strip() != "" for v in values.flat],
+                      dtype=bool).reshape(values.shape)
+
+    keep = np.ones(values.shape[0], dtype=bool)
+
+    for r in range(values.shape[0] - 1, 0, -1):
+        cells = filled[r]
+        if not cells.any() or (cells & ~filled[r - 1]).any():
+            continue
+        if not all(v.lstrip()[0].islower() for v in values[r][cells]):
+            continue
+
+        for c in np.flatnonzero(cells):
+            values[r - 1, c] = values[r - 1, c].rstrip() + " " + values[r, c].strip()
+        filled[r - 1] |= cells
+        keep[r] = False
+
+    if keep.all():
+        return header
+
+    merged = header.iloc[keep].copy()
+    for c in range(0, merged.shape[1]):
+        merged.isetitem(c, values[keep, c])
+    return merged
+
+
+def header_levels(header):
+    """Returns the header as a columns x levels array, each label once
+
+    Spanning headings are filled right and down, and a label repeated
+    further down the same column is blanked.
+    """
+
+    header = header.ffill(axis=0).ffill(axis=1)
+
+    # levels get the dtypes a MultiIndex gives them
+    index = pd.MultiIndex.from_arrays(header.values)
+    levels = index.to_frame(index=False).to_numpy(dtype=object)
+
+    return blank_repeats(levels)
+
+
+def clean_label(value):
+    value = value.strip()
+    value = ELLIPSIS.sub("", value)
+    value = value.replace("/\n", "/")
+    value = value.replace("\n", " ")
+    value = value.replace("- ", "")
+    return YEAR_FLOAT.sub(r"\1", value)
+
+
+def parse_header(header, refs, levels=7, columns=None):
+    """Returns col_info columns for the header rows of a sheet
+
+    header holds the rows above the column numbers, without the stub
+    column. Each data column becomes a row with its column_index,
+    column_level_1..levels and column_ref_note_1..levels. columns are the
+    positions of the data columns in header, see DataRegion; without them
+    columns with the same header, like standard error and footnote
+    columns, are kept once. refs is the table's FootnoteIndex.
+    """
+
+    header = merge_continuation_rows(header)
+    grid = header_levels(header)
+
+    if columns is not None:
+        grid = grid[columns]
+
+    # strings the way astype(str) makes them, footnotes split off
+    labels = pd.DataFrame(grid).astype(str).to_numpy(dtype=object)
+
+    data = {}
+    for x in range(0, levels):
+        if x < labels.shape[1]:
+            level, note = refs.split_values(labels[:, x])
+            data[f"column_level_{x+1}"] = level
+            data[f"column_ref_note_{x+1}"] = note
+        else:
+            data[f"column_level_{x+1}"] = [""] * labels.shape[0]
+            data[f"column_ref_note_{x+1}"] = [""] * labels.shape[0]
+
+    col_info = pd.DataFrame(data)
+    if columns is None:
+        col_info = col_info.drop_duplicates().reset_index(drop=True)
+
+    for col in col_info.columns:
+        col_info[col] = map_unique(col_info[col].to_numpy(dtype=object), clean_label)
+
+    col_info.insert(0, "column_index", [column_letter(i) for i in range(0, col_info.shape[0])])
+    return col_info
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# Row hierarchy
+
+
+def build_row_levels(styles, first, last, levels=7):
+    """Returns the row levels, subtitle and is_total of rows first to last
+
+    Reads only the StyleIndex arrays: bold stubs open a level, bold stubs
+    indented 3 or 5 spaces are totals, double borders in column B close a
+    total, and other indents nest by two spaces per level.
+
+    The labels go into one preallocated array, columns 0 to levels - 1
+    followed by "subtitle" and "is_total", and the frame is made at the end.
+    """
+
+    total_level = 0
+    # super_total_level = 0
+    bold_level = 0
+    indent_level = 0
+    rows = last - first + 1
+    subtitle = ""
+
+    labels = np.full([rows, levels + 2], np.nan, dtype=object)
+
+    for i, row in enumerate(range(first, last + 1)):
+        value = styles.values_a[row]
+        is_bold = bool(styles.bold_a[row])
+        is_empty = bool(styles.empty_a[row])
+        indents = int(styles.indent_a[row])
+        is_total = is_bold and (indents == 3 or indents == 5)
+        # is_super_total = is_bold and indents == 5
+
+        # identify end of total (double lines) above
+        cell_above_btm_border = styles.bottom_b[row-1]
+        cell_over_top_border = styles.top_b[row]
+
+        # reset total_level back to 0
+        if cell_above_btm_border == 6 or cell_over_top_border == 6:
+            indents_above = styles.indent_a[row-1]
+            if not indents_above == 5:
+                total_level = max(total_level-1, 0)
+
+        # Concats cell.value for multi-row cells
+        cell_value = value
+        if indents == 3 and not is_bold:
+            cell_value = styles.values_a[row-1] + value
+
+        # identifying subtable titles
+        if is_empty and styles.values_b[row].strip() != "":
+            subtitle = styles.values_b[row]
+
+        if indents in [0, 3, 5]:
+            indent_level = 0
+        else:
+            indent_level = indents / 2
+
+        # if is_super_total:
+        #     super_total_level = max(super_total_level-1, 0)
+        #     labels[i, levels] = subtitle
+        #     labels[i, levels + 1] = "TRUE"
+        #     labels[i, super_total_level] = cell_value
+        #     super_total_level += 1
+        if is_total:
+            level = total_level + bold_level
+            total_level += 1
+        elif is_bold:
+            bold_level = max(bold_level-1, 0)
+            level = total_level + bold_level + indent_level
+            bold_level += 1
+        else:
+            level = total_level + max(bold_level, indent_level)
+
+        # odd indents and nesting deeper than levels have no column
+        if level != int(level) or level >= levels:
+            raise ValueError(f"Row {row} would be at row level {level + 1}, "
+                             f"tables have {levels}")
+
+        labels[i, int(level)] = cell_value
+        labels[i, levels] = subtitle
+        labels[i, levels + 1] = "TRUE" if is_total else "FALSE"
+
+    columns = list(range(0, levels)) + ["subtitle", "is_total"]
+    return pd.DataFrame(labels, index=range(first, last+1), columns=columns)
+
+
+def forward_fill(values):
+    """Returns a 2d object array with missing values filled from the left,
+    then from above"""
+
+    filled = values
+    for axis in [1, 0]:
+        missing = pd.isna(filled)
+        index = np.where(missing, 0, np.arange(filled.shape[axis]).reshape(
+            (1, -1) if axis == 1 else (-1, 1)))
+        index = np.maximum.accumulate(index, axis=axis)
+        filled = np.take_along_axis(filled, index, axis=axis)
+
+    return filled
+
+
+def blank_repeats(values):
+    """Blanks each value that repeats one to its left in the same row
+
+    Missing values count as equal, the way DataFrame.duplicated sees them.
+    """
+
+    values = values.copy()
+    missing = pd.isna(values)
+    repeat = np.zeros(values.shape, dtype=bool)
+
+    for i in range(1, values.shape[1]):
+        for j in range(0, i):
+            same = (values[:, i] == values[:, j]) | (missing[:, i] & missing[:, j])
+            repeat[:, i] |= same
+
+    values[repeat] = ""
+    return values
+
+
+def fill_row_levels(row_levels):
+    """Returns row_levels with each label carried into the rows it spans
+
+    Empty labels are filled from the left and from above, then a label
+    repeated further right in the same row is blanked.
+    """
+
+    values = row_levels.to_numpy(dtype=object)
+    values = np.where(values == "", np.nan, values)
+
+    values = blank_repeats(forward_fill(values))
+    return pd.DataFrame(values, index=row_levels.index, columns=row_levels.columns)
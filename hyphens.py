@@ -0,0 +1,50 @@
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# Hyphen dictionary
+
+# scraping_dictionary.csv next to this file, whatever the working directory
+DICTIONARY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "scraping_dictionary.csv")
+
+
+class HyphenMatcher():
+    """Replaces every dictionary entry in a single scan of a string
+
+    Entries keep their regex meaning and are tried in dictionary order, all
+    combined into one alternation.
+    """
+
+    def __init__(self, hyphen_dict):
+        self.corrected = list(hyphen_dict.values())
+        self.pattern = None
+
+        if hyphen_dict:
+            self.pattern = re.compile("|".join(
+                f"(?P<e{i}>{hyphenated})" for i, hyphenated in enumerate(hyphen_dict)))
+
+    def replace(self, match):
+        return self.corrected[int(match.lastgroup[1:])]
+
+    def clean(self, value):
+        if self.pattern is None:
+            return value
+
+        return self.pattern.sub(self.replace, value)
+
+
+@lru_cache(maxsize=None)
+def load_hyphen_matcher(path=DICTIONARY_PATH):
+    """Returns the matcher for a dictionary csv, read once per process"""
+
+    try:
+        hyphen_df = pd.read_csv(path)
+    except FileNotFoundError:
+        print(f"{path} is missing!")
+        return HyphenMatcher({})
+
+    hyphen_dict = dict(zip(hyphen_df['hyphenated'], hyphen_df['corrected']))
+    return HyphenMatcher(hyphen_dict)
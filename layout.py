@@ -0,0 +1,115 @@
+import re
+
+# Table layout
+
+HEADNOTE = re.compile(r"\s*\[.*\]\s*")
+FOOTNOTE = re.compile(r"\\([0-9]+)\\(.*)")
+SPECIAL_NOTE = re.compile(r"^(---|[†‡#!])(.*)")
+GENERAL_NOTE = re.compile(r"NOTE: (.*)")
+SOURCE = re.compile(r"SOURCE: (.*)\((.*)\)")
+
+
+class LayoutError(ValueError):
+    """Raised when a sheet does not have the Digest table layout"""
+
+
+class TableLayout():
+    """Row boundaries of the regions of a Digest table sheet
+
+    title_lines      rows before the header (title, and headnote if any)
+    header_end       row numbering the columns, the last header row
+    data_start       first data row
+    data_end         last data row
+    notes_start      first row after the data
+
+    footnote_rows, special_note_rows, note_row and source_row locate the
+    lines in the notes region below the data.
+    """
+
+    def __init__(self, nrows, title_lines, header_end, data_end,
+                 footnote_rows, special_note_rows, note_row, source_row):
+        self.nrows = nrows
+
+        self.title_row = 0
+        self.headnote_row = 1 if title_lines == 2 else None
+        self.title_lines = title_lines
+
+        self.stub_head_row = title_lines
+        self.header_start = title_lines
+        self.header_end = header_end
+
+        self.data_start = header_end + 1
+        self.data_end = data_end
+
+        self.notes_start = data_end + 1
+        self.footnote_rows = footnote_rows
+        self.special_note_rows = special_note_rows
+        self.note_row = note_row
+        self.source_row = source_row
+
+
+def detect_layout(values, styles):
+    """Returns the TableLayout of a sheet, walking column A once
+
+    values are the sheet rows from Workbook.values and styles its
+    StyleIndex. Raises LayoutError if a region cannot be found.
+    """
+
+    col_a = [row[0] if row else "" for row in values]
+    nrows = len(col_a)
+
+    if nrows < 2:
+        raise LayoutError("sheet has no rows below the title")
+
+    title_lines = 1
+    if isinstance(col_a[1], str) and HEADNOTE.match(col_a[1]):
+        title_lines = 2
+
+    header_end = None
+    data_end = None
+    footnote_rows = []
+    special_note_rows = []
+    note_row = None
+    source_row = None
+
+    for row, value in enumerate(col_a):
+
+        # header ends at the row numbering the columns
+        if header_end is None:
+            if value == 1 or value == "1":
+                header_end = row
+            continue
+
+        # data ends at the first single line above or below a stub
+        if data_end is None:
+            if row < header_end + 2:
+                continue
+            if styles.top_a[row] == 1:
+                data_end = row - 1
+            elif styles.bottom_a[row] == 1:
+                data_end = row
+                continue
+            else:
+                continue
+
+        if not isinstance(value, str):
+            continue
+
+        if FOOTNOTE.search(value):
+            footnote_rows.append(row)
+        if SPECIAL_NOTE.match(value):
+            special_note_rows.append(row)
+        if note_row is None and GENERAL_NOTE.search(value):
+            note_row = row
+        if source_row is None and SOURCE.search(value):
+            source_row = row
+
+    if header_end is None:
+        raise LayoutError("no header row numbering the columns (a 1 in column A)")
+    if data_end is None:
+        raise LayoutError("no single border closing the data rows")
+    if source_row is None:
+        raise LayoutError("no 'SOURCE: ... (...)' line below the data")
+
+    return TableLayout(nrows, title_lines, header_end, data_end,
+                       footnote_rows, special_note_rows, note_row, source_row)
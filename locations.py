@@ -0,0 +1,151 @@
+import re
+
+import numpy as np
+
+from arrays import map_unique
+
+# Location detection
+
+# stub heads of tables with one location per row, and the location_type
+# their rows get (None for the stub head itself)
+ROW_STUB_HEADS = {
+    'Region and year': "Region",
+    'State': None,
+    'Name of district': None,
+    'State or jurisdiction': None,
+    'Region, state, and jurisdiction': None,
+}
+
+STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado",
+    "Connecticut", "Delaware", "District of Columbia", "Florida", "Georgia",
+    "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky",
+    "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota",
+    "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire",
+    "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota",
+    "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island",
+    "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+]
+
+JURISDICTIONS = [
+    "American Samoa", "Guam", "Northern Marianas", "Northern Mariana Islands",
+    "Puerto Rico", "U.S. Virgin Islands", "Virgin Islands", "Marshall Islands",
+    "Micronesia", "Palau", "Other jurisdictions", "Bureau of Indian Education",
+    "Bureau of Indian Affairs", "Department of Defense (DoD)", "DoD, overseas",
+    "DoD, domestic", "DoDEA", "DoDDS", "DDESS",
+]
+
+REGIONS = [
+    "United States", "Northeast", "Midwest", "South", "West", "New England",
+    "Mideast", "Great Lakes", "Plains", "Southeast", "Southwest",
+    "Rocky Mountains", "Far West",
+]
+
+# school district names, like "Los Angeles Unified" or "Clark County School District"
+DISTRICT = re.compile(
+    r"\b(school district|public schools|city schools|county schools|"
+    r"unified|independent school district|isd|school system|"
+    r"schools of the|county public|parish school)\b", re.IGNORECASE)
+
+# a label with a year is a year, not a place
+YEAR = re.compile(r"\s*(\d{4})\s*")
+
+# distinct places a row or column axis needs to hold locations
+MIN_PLACES = 3
+
+# share of the labelled rows or columns that must name places, when none of
+# the places is a state or jurisdiction
+MIN_SHARE = 0.75
+
+
+def place_key(label):
+    """Returns the gazetteer key of a label: lowercase, single spaces, no
+    leading or trailing dots, digits and punctuation"""
+
+    key = re.sub(r"\s+", " ", label).strip().lower()
+    return key.strip(" .…:,;*0123456789")
+
+
+GAZETTEER = {}
+for names, kind in [(STATES, "State"), (JURISDICTIONS, "Jurisdiction"), (REGIONS, "Region")]:
+    for name in names:
+        GAZETTEER[place_key(name)] = kind
+
+
+def location_type(label):
+    """Returns the type of place a label names, or "" """
+
+    if not isinstance(label, str) or label.strip() == "":
+        return ""
+
+    found = GAZETTEER.get(place_key(label))
+    if found:
+        return found
+    if DISTRICT.search(label):
+        return "District"
+    return ""
+
+
+def is_usable(label):
+    """Returns whether label can name a location: not empty and no year"""
+
+    return isinstance(label, str) and label != "" and not YEAR.search(label)
+
+
+def lowest_labels(df, cols):
+    """Returns the last label of each row of df that is not empty and has no
+    year, "" for rows without one"""
+
+    labels = df[cols].to_numpy(dtype=object)
+    usable = map_unique(labels, is_usable, dtype=bool, missing=False)
+
+    return pick_last(labels, usable)
+
+
+def find_places(df, cols):
+    """Returns (location, location_type) arrays for the rows of df
+
+    The location of a row is its last label that names a place in the
+    gazetteer or a school district, each distinct label is looked up once.
+    """
+
+    labels = df[cols].to_numpy(dtype=object)
+    types = map_unique(labels, location_type, missing="")
+
+    is_place = types != ""
+    return pick_last(labels, is_place), pick_last(types, is_place)
+
+
+def pick_last(values, mask):
+    """Returns the value at the last True of mask in each row, or "" """
+
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    picked = values[np.arange(values.shape[0]), last]
+
+    return np.where(mask.any(axis=1), picked, "").astype(object)
+
+
+def count_places(locations):
+    """Returns the number of distinct places in a location array"""
+
+    return len(set(locations) - {""})
+
+
+def holds_locations(df, cols, location, location_type):
+    """Returns whether the rows of df are broken down by location
+
+    location and location_type are find_places' arrays for df. The rows
+    need MIN_PLACES distinct places, and either a state or jurisdiction
+    among them or a place on more than MIN_SHARE of the rows with a label.
+    A few region rows, like the Region breakdown of a table by student
+    characteristics, are not enough.
+    """
+
+    if count_places(location) < MIN_PLACES:
+        return False
+    if np.isin(location_type, ["State", "Jurisdiction"]).any():
+        return True
+
+    labelled = lowest_labels(df, cols) != ""
+    return (location != "")[labelled].sum() > MIN_SHARE * labelled.sum()
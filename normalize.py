@@ -0,0 +1,115 @@
+import os
+import re
+
+import pandas as pd
+
+from arrays import map_unique
+from compact import recode
+from footnotes import REFERENCE
+from hyphens import DICTIONARY_PATH, load_hyphen_matcher
+
+# Text normalization rules
+#
+# A rule is (kind, pattern, replacement, frames):
+#   "regex"   - re.sub(pattern, replacement, value)
+#   "exact"   - value becomes replacement when it equals pattern
+#   "hyphens" - replaces words from the hyphen dictionary csv at pattern,
+#               or at the normalizer's dictionary_path when pattern is None
+# Rules run in list order, only on the frames they name, and only touch
+# string values.
+
+ALL_FRAMES = ("table_info", "row_info", "col_info", "cell_info")
+
+# run before years are detected
+LABEL_RULES = [
+    # clean up row_info footnotes
+    ("regex", REFERENCE.pattern, "", ("row_info",)),
+    ("regex", r"(.*)!$", r"\1", ("row_info",)),
+
+    # clean up multiple whitespace
+    ("regex", r"\s+", " ", ALL_FRAMES),
+
+    # remove all elipses
+    ("regex", " …", "", ALL_FRAMES),
+    ("regex", "…", "", ALL_FRAMES),
+]
+
+# run on the finished frames
+OUTPUT_RULES = [
+    # clean up empty paren
+    ("regex", r"\(\)", "", ("row_info",)),
+
+    # replace all nan with ""
+    ("exact", "nan", "", ALL_FRAMES),
+
+    # clean hyphens based on dictionary words
+    ("hyphens", None, None, ALL_FRAMES),
+
+    # replace "/ "
+    ("regex", r"/ ", "/", ("table_info", "row_info", "col_info")),
+
+    # remove footnote references
+    ("regex", REFERENCE.pattern, "", ALL_FRAMES),
+]
+
+
+class TextNormalizer():
+    """Applies an ordered list of text rules in one pass per column"""
+
+    def __init__(self, rules, dictionary_path=DICTIONARY_PATH):
+        self.rules = rules
+        self.dictionary_path = dictionary_path
+        self.steps = [self.compile(rule) for rule in rules]
+
+    def compile(self, rule):
+        """Returns (function, frames) for a rule"""
+
+        kind, pattern, replacement, frames = rule
+
+        if kind == "regex":
+            rx = re.compile(pattern)
+            return (lambda value: rx.sub(replacement, value)), frames
+
+        if kind == "exact":
+            return (lambda value: replacement if value == pattern else value), frames
+
+        if kind == "hyphens":
+            path = os.path.abspath(pattern or self.dictionary_path)
+            return load_hyphen_matcher(path).clean, frames
+
+        raise ValueError(f"Unknown rule kind: {kind}")
+
+    def clean(self, value, funcs):
+        if not isinstance(value, str):
+            return value
+
+        for func in funcs:
+            value = func(value)
+
+        return value
+
+    def normalize(self, df, frame):
+        """Returns df with the rules for frame applied to its string columns"""
+
+        funcs = [func for func, frames in self.steps if frame in frames]
+        if not funcs:
+            return df
+
+        df = df.copy()
+
+        for i, dtype in enumerate(df.dtypes):
+            if isinstance(dtype, pd.CategoricalDtype):
+                # clean the categories and keep the column compact
+                col = df.iloc[:, i]
+                cleaned = [self.clean(value, funcs) for value in col.cat.categories]
+                df.isetitem(i, recode(col.cat.codes.to_numpy(), cleaned))
+                continue
+
+            if not pd.api.types.is_string_dtype(dtype):
+                continue
+
+            # each distinct value is cleaned once, missing values stay nan
+            df.isetitem(i, map_unique(df.iloc[:, i].to_numpy(dtype=object),
+                                      lambda value: self.clean(value, funcs)))
+
+        return df
@@ -0,0 +1,247 @@
+import argparse
+import os
+import queue
+import threading
+import time
+import traceback
+
+from batch import BatchRunner, write_report
+from cache import ResultCache
+from dataset import DATASET_ROOT
+from download_files import BASE_URL, Downloader, read_table_list
+from hyphens import DICTIONARY_PATH
+from table import Table
+from writers import FORMATS, write_frames
+
+# Download, parse and write pipeline
+#
+# The three stages run at the same time and hand tables on as soon as they
+# are ready:
+#
+#   fetch threads --parse queue--> parse workers --write queue--> writer thread
+#
+# The parse workers are BatchRunner's, so a table that crashes its worker
+# or runs past timeout seconds fails alone and the worker is replaced. At
+# most queue_size tables wait for a parse worker and at most queue_size
+# wait for the writer, so a fast stage waits for a slow one instead of
+# piling up tables in memory.
+
+
+def parse_table(filename, table_options, cache_dir=None):
+    """Parses one workbook in a worker process and returns the fields the
+    writer needs"""
+
+    if cache_dir:
+        table = ResultCache(cache_dir).load_table(filename, table_options)
+    else:
+        table = Table(filename, **table_options)
+
+    return {
+        "table_id": table.id,
+        "out_filename": table.out_filename,
+        "frames": table.frames_for_output(),
+    }
+
+
+class TablePipeline():
+    """Downloads, parses and writes tables with the stages overlapped
+
+    fetch_workers threads download, workers processes parse and one thread
+    writes. At most queue_size tables wait between two stages, and a table
+    still parsing after timeout seconds fails.
+    """
+
+    def __init__(self, downloader, workers=None, queue_size=None, max_tasks=25,
+                 timeout=300, report="failures.json", table_options=None,
+                 output_format="xlsx", destination=None, cache_dir=None):
+        self.downloader = downloader
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or 2 * self.workers
+        self.max_tasks = max_tasks
+        self.timeout = timeout
+        self.report = report
+        self.table_options = dict(table_options or {})
+        self.output_format = output_format
+        self.destination = destination
+        self.cache_dir = cache_dir
+
+        self.results = []
+
+        # when each table's download started, by filename
+        self.started = {}
+
+    def fetch(self, tables, parse_queue, write_queue):
+        """Downloads tables until there are none left, one thread each"""
+
+        while True:
+            try:
+                tab = tables.get_nowait()
+            except queue.Empty:
+                break
+
+            filename = self.downloader.get_filename(tab)
+            self.started[filename] = time.perf_counter()
+
+            status, error = self.downloader.download(tab)
+            if status == "error":
+                write_queue.put({"filename": filename, "table_id": "",
+                                 "status": "download_error", "error": error})
+            else:
+                parse_queue.put(filename)
+
+    def close_after(self, fetchers, parse_queue):
+        """Ends the parse queue once every download has finished"""
+
+        for t in fetchers:
+            t.join()
+        parse_queue.put(None)
+
+    def write(self, write_queue):
+        """Writes parsed tables in the order they finish"""
+
+        while True:
+            result = write_queue.get()
+            if result is None:
+                break
+
+            if result["status"] == "ok":
+                try:
+                    self.write_table(result)
+                except Exception:
+                    result["status"], result["error"] = "write_error", traceback.format_exc()
+
+            self.record({
+                "filename": result["filename"],
+                "table_id": result["table_id"],
+                "status": result["status"],
+                "error": result["error"],
+                "elapsed": round(time.perf_counter() - self.started[result["filename"]], 3),
+            })
+
+    def write_table(self, parsed):
+        if self.output_format == "dataset":
+            destination = self.destination or DATASET_ROOT
+        else:
+            destination = parsed["out_filename"]
+            out_dir = os.path.dirname(destination)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+
+        write_frames(parsed["frames"], destination, self.output_format)
+
+    def record(self, result):
+        self.results.append(result)
+
+        name = os.path.basename(result["filename"])
+        print(f"[{len(self.results)}/{self.total}] {name} "
+              f"{result['status']} ({result['elapsed']:.1f}s)", flush=True)
+
+    def run(self, tables):
+        """Runs every table through the pipeline and returns the result dicts"""
+
+        self.total = len(tables)
+        self.results = []
+        self.started = {}
+        os.makedirs(self.downloader.directory, exist_ok=True)
+
+        pending = queue.Queue()
+        for tab in tables:
+            pending.put(tab)
+
+        parse_queue = queue.Queue(self.queue_size)
+        write_queue = queue.Queue(self.queue_size)
+
+        fetchers = [threading.Thread(target=self.fetch, args=(pending, parse_queue, write_queue),
+                                     daemon=True)
+                    for _ in range(0, min(self.downloader.workers, max(self.total, 1)))]
+        closer = threading.Thread(target=self.close_after, args=(fetchers, parse_queue),
+                                  daemon=True)
+        writer = threading.Thread(target=self.write, args=(write_queue,), daemon=True)
+
+        for t in fetchers:
+            t.start()
+        closer.start()
+        writer.start()
+
+        runner = BatchRunner(
+            workers=self.workers,
+            timeout=self.timeout,
+            max_tasks=self.max_tasks,
+            report=None,
+            task=parse_table,
+            task_options={"table_options": self.table_options, "cache_dir": self.cache_dir}
+        )
+        for result in runner.imap(parse_queue):
+            write_queue.put(result)
+
+        # every parse has finished and been queued for the writer
+        write_queue.put(None)
+        writer.join()
+
+        if self.report:
+            write_report(self.results, self.total, self.report)
+        self.downloader.save_manifest()
+
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download, parse and write Digest tables in one overlapped run")
+    parser.add_argument("--list", default="table_list.csv",
+                        help="csv with one table number per line")
+    parser.add_argument("--directory", default="100tables/",
+                        help="where the workbooks are downloaded to")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--fetch-workers", type=int, default=8,
+                        help="parallel downloads")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parse processes (default: all cores)")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="tables waiting between stages (default: twice the workers)")
+    parser.add_argument("--max-tasks", type=int, default=25,
+                        help="tables per parse process before it is replaced")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="seconds allowed to parse a table")
+    parser.add_argument("--report", default="failures.json",
+                        help="json file listing the failed tables")
+    parser.add_argument("--format", default="xlsx", choices=FORMATS)
+    parser.add_argument("--dataset-root", default=DATASET_ROOT,
+                        help="directory of the corpus datasets for --format dataset")
+    parser.add_argument("--dictionary", default=DICTIONARY_PATH,
+                        help="hyphen dictionary csv")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep string columns as categoricals to save memory")
+    parser.add_argument("--shared-columns", action="store_true",
+                        help="keep col_info once per table instead of once per subtable")
+    parser.add_argument("--cache", default=None,
+                        help="directory of the result cache (default: no cache)")
+    args = parser.parse_args()
+
+    downloader = Downloader(
+        base_url=args.base_url,
+        directory=args.directory,
+        workers=args.fetch_workers
+    )
+
+    pipeline = TablePipeline(
+        downloader,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        max_tasks=args.max_tasks,
+        timeout=args.timeout,
+        report=args.report,
+        table_options={"dictionary_path": args.dictionary, "compact": args.compact,
+                       "shared_columns": args.shared_columns},
+        output_format=args.format,
+        destination=args.dataset_root if args.format == "dataset" else None,
+        cache_dir=args.cache
+    )
+    results = pipeline.run(read_table_list(args.list))
+
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results) - failed} tables written, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
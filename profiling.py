@@ -0,0 +1,111 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Step profiling
+
+
+class Profiler():
+    """Records wall time, CPU time, peak memory and frame sizes per step
+
+    Memory is traced with tracemalloc, which slows the pipeline down; pass
+    memory=False to only time the steps.
+    """
+
+    def __init__(self, enabled=False, memory=True):
+        self.enabled = enabled
+        self.memory = memory
+        self.records = []
+
+    @contextmanager
+    def measure(self, step, table=None, writes=()):
+        """Times the code in the with block as one step
+
+        Row and column counts are summed over the dataframes in writes,
+        read from table once the step is done.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        # tracing is stopped again by the step that started it, so tables
+        # made later without profiling are not traced
+        started = False
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+
+        try:
+            yield
+        except BaseException:
+            if started:
+                tracemalloc.stop()
+            raise
+
+        record = {
+            "step": step,
+            "seconds": time.perf_counter() - start_wall,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "peak_mb": None,
+            "rows": None,
+            "columns": None,
+        }
+
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            record["peak_mb"] = (peak - start_memory) / 1024 ** 2
+            if started:
+                tracemalloc.stop()
+
+        shapes = [getattr(table, attr).shape for attr in writes
+                  if isinstance(getattr(table, attr, None), pd.DataFrame)]
+        if shapes:
+            record["rows"] = sum(shape[0] for shape in shapes)
+            record["columns"] = sum(shape[1] for shape in shapes)
+
+        self.records.append(record)
+
+    def to_frame(self):
+        columns = ["step", "seconds", "cpu_seconds", "peak_mb", "rows", "columns"]
+        return pd.DataFrame(self.records, columns=columns)
+
+
+def summarize(profile):
+    """Returns per-step totals of a profile dataframe from many tables"""
+
+    summary = profile.groupby("step", sort=False).agg(
+        tables=("seconds", "size"),
+        total_seconds=("seconds", "sum"),
+        mean_seconds=("seconds", "mean"),
+        max_seconds=("seconds", "max"),
+        total_cpu_seconds=("cpu_seconds", "sum"),
+        max_peak_mb=("peak_mb", "max"),
+    )
+    return summary.sort_values("total_seconds", ascending=False).reset_index()
+
+
+def write_profile(profile, path):
+    """Writes a profile and its per-step summary as csv, or json by extension"""
+
+    stem, ext = os.path.splitext(path)
+    summary = summarize(profile)
+
+    if ext == ".json":
+        with open(path, "w") as f:
+            json.dump(profile.to_dict(orient="records"), f, indent=2)
+        with open(f"{stem}_summary{ext}", "w") as f:
+            json.dump(summary.to_dict(orient="records"), f, indent=2)
+    else:
+        profile.to_csv(path, index=False)
+        summary.to_csv(f"{stem}_summary{ext}", index=False)
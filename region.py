@@ -0,0 +1,192 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from arrays import map_unique
+from footnotes import REFERENCE
+from workbook import column_letter
+
+# Data region
+#
+# The columns right of the stub hold the values. Beside many of them sit
+# narrow columns holding only a footnote reference (\1\) or a "!" flag for
+# the value on their left, and some sheets have spacer columns that are
+# blank on every data row. Standard errors have columns of their own, in
+# parentheses right of their estimates and under the same header.
+
+FOOTNOTE_CELL = re.compile(r"^" + REFERENCE.pattern + r"$")
+
+STANDARD_ERROR = re.compile(r"standard errors?", re.IGNORECASE)
+
+
+def cell_strings(df):
+    """Returns the values of df as a 2d array of strings, missing as "" """
+
+    values = df.to_numpy(dtype=object)
+    missing = pd.isna(values)
+
+    strings = np.empty(values.shape, dtype=object)
+    strings[missing] = ""
+    strings[~missing] = [str(v) for v in values[~missing]]
+    return strings
+
+
+def classify_cells(strings):
+    """Returns (is_footnote, is_special_note, is_blank) masks of a 2d string
+    array, testing each distinct string once"""
+
+    return map_unique(
+        strings,
+        lambda v: (bool(FOOTNOTE_CELL.match(v)), v.startswith("!"), v.strip() == ""),
+        dtype=[bool, bool, bool], missing=False)
+
+
+def fold_note_columns(strings, rows):
+    """Returns (strings, columns) of the data columns of a sheet
+
+    Footnote and "!" columns are appended to the nearest value column on
+    their left, and columns blank on every data row are dropped. strings
+    holds the sheet without the stub column, rows marks its data rows and
+    columns are the positions of the data columns in strings.
+    """
+
+    strings = strings.copy()
+    is_footnote, is_special_note, is_blank = classify_cells(strings)
+    is_blank = is_blank[rows]
+
+    fold = (is_footnote | is_special_note).any(axis=0)
+    keep = ~fold
+
+    # notes go into the value column on their left, in column order
+    targets = np.maximum.accumulate(np.where(keep, np.arange(len(keep)), -1))
+    for c in np.flatnonzero(fold):
+        if targets[c] < 0:
+            keep[c] = True
+            continue
+        strings[:, targets[c]] = strings[:, targets[c]] + strings[:, c]
+        is_blank[:, targets[c]] &= is_blank[:, c]
+
+    # spacer columns and columns with only a column number
+    keep &= ~is_blank.all(axis=0)
+
+    columns = np.flatnonzero(keep)
+    return strings[:, columns], columns
+
+
+def fill_left(strings):
+    """Returns strings with each blank filled from the nearest value on its
+    left in the same row, the way merged header cells span columns"""
+
+    index = np.where(strings != "", np.arange(strings.shape[1]), 0)
+    index = np.maximum.accumulate(index, axis=1)
+    return np.take_along_axis(strings, index, axis=1)
+
+
+def nearest_estimates(is_standard_error):
+    """Returns the position of the nearest column on the left of each
+    standard error column that is not one, -1 for the other columns"""
+
+    estimates = np.maximum.accumulate(
+        np.where(is_standard_error, -1, np.arange(len(is_standard_error))))
+    return np.where(is_standard_error, estimates, -1)
+
+
+def find_standard_errors(strings, header, headnote=""):
+    """Returns (is_standard_error, estimates) for the columns of strings
+
+    strings holds the data rows and header the header rows above them, as
+    strings. A column holds standard errors when it has the same header as
+    the estimate column on its left, or its header or the headnote says
+    "standard error", and more than half of its non-blank cells are in
+    parentheses, like "(0.42)" or "(†)". Parenthesized numbers under a
+    header of their own, like negative changes, are not standard errors.
+
+    estimates gives the position of the nearest estimate column on the
+    left of each standard error column, -1 for the other columns.
+    """
+
+    unmarked = map_unique(strings, lambda v: REFERENCE.sub("", v).strip().rstrip("!*").strip(),
+                          missing="")
+    in_parentheses = map_unique(unmarked, lambda v: v.startswith("(") and v.endswith(")"),
+                                dtype=bool, missing=False)
+    filled = unmarked != ""
+
+    candidates = in_parentheses.sum(axis=0) * 2 > filled.sum(axis=0)
+    estimates = nearest_estimates(candidates)
+
+    # merged header cells span the estimate and its standard errors
+    labels = fill_left(map_unique(header, lambda v: REFERENCE.sub("", v).strip(), missing=""))
+    same_header = (labels == labels[:, np.maximum(estimates, 0)]).all(axis=0)
+    same_header &= labels.shape[0] > 0
+
+    says_standard_error = map_unique(labels, lambda v: bool(STANDARD_ERROR.search(v)),
+                                     dtype=bool, missing=False).any(axis=0)
+    if STANDARD_ERROR.search(headnote):
+        says_standard_error[:] = True
+
+    confirmed = same_header | says_standard_error
+
+    is_standard_error = candidates & (estimates >= 0) & confirmed
+    estimates = nearest_estimates(is_standard_error)
+    is_standard_error &= estimates >= 0
+
+    return is_standard_error, np.where(is_standard_error, estimates, -1)
+
+
+class DataRegion():
+    """The data columns right of the stub, classified over the whole sheet
+
+    Rows first to last hold the data, the header is the rows from
+    header_first up to the column number row above first.
+
+    values               the columns as strings, named A, B, ...
+    sheet_columns        the sheet column each data column comes from
+    is_standard_error    the columns holding standard errors
+    estimates            the position of each standard error column's
+                         estimate column, -1 for the other columns
+    """
+
+    def __init__(self, df, first, last, header_first=None, headnote=""):
+        strings = cell_strings(df.loc[:, 1:])
+        rows = (df.index >= first) & (df.index <= last)
+        header_first = first - 1 if header_first is None else header_first
+        header_rows = (df.index >= header_first) & (df.index < first - 1)
+
+        strings, columns = fold_note_columns(strings, rows)
+        self.sheet_columns = columns + 1
+
+        self.is_standard_error, self.estimates = find_standard_errors(
+            strings[rows], strings[header_rows], headnote)
+
+        letters = [column_letter(i) for i in range(0, len(columns))]
+        self.values = pd.DataFrame(strings, index=df.index, columns=letters)
+
+    @property
+    def columns(self):
+        return list(self.values.columns)
+
+    def get_pairs(self):
+        """Returns {column_index: paired column_index}, standard error
+        columns to their estimate and estimates to their standard error"""
+
+        pairs = {}
+        for c in np.flatnonzero(self.is_standard_error):
+            estimate = self.columns[self.estimates[c]]
+            pairs[self.columns[c]] = estimate
+            pairs[estimate] = self.columns[c]
+        return pairs
+
+
+def blank_rows(data):
+    """Returns a mask of the rows of data with no value past column A
+
+    Column A is skipped, subtable title rows have their title there.
+    """
+
+    strings = cell_strings(data)
+    _, _, is_blank = classify_cells(strings)
+
+    if is_blank.shape[1] > 1:
+        is_blank = is_blank[:, 1:]
+    return is_blank.all(axis=1)
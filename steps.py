@@ -0,0 +1,117 @@
+# Table pipeline steps
+
+
+class Step():
+    """A Table method and the attributes it reads and writes
+
+    result names the attribute the method's return value is stored in.
+    frame is passed to methods that run once per dataframe.
+    """
+
+    def __init__(self, method, reads=(), writes=(), result=None, frame=None):
+        self.method = method
+        self.reads = list(reads)
+        self.writes = list(writes)
+        self.result = result
+        self.frame = frame
+
+        if result is not None:
+            self.writes.append(result)
+
+        self.name = method if frame is None else f"{method}[{frame}]"
+
+        # a step that changes an attribute needs its earlier state,
+        # a step that builds one from scratch does not
+        self.needs = set(self.reads)
+        self.needs.update(w for w in self.writes if w != result)
+
+    def run(self, table):
+        args = () if self.frame is None else (self.frame,)
+        value = getattr(table, self.method)(*args)
+
+        if self.result is not None:
+            setattr(table, self.result, value)
+
+
+def per_frame(method, frames, reads=()):
+    """Returns one step per frame for a method taking the frame name"""
+
+    return [Step(method, reads=reads, writes=[frame], frame=frame) for frame in frames]
+
+
+class StepRunner():
+    """Runs a Table's steps, either all in order or only those a frame needs
+
+    Steps always run in list order. When a step is about to overwrite an
+    attribute that a skipped earlier step reads, a copy is kept so that
+    step sees the same input if it is needed later.
+    """
+
+    def __init__(self, table, steps):
+        self.table = table
+        self.steps = steps
+
+        self.done = [False] * len(steps)
+        self.snapshots = {}
+        self.running = False
+
+    def needed(self, targets):
+        """Returns the indexes of the unrun steps the targets depend on"""
+
+        attrs = set(targets)
+        indexes = []
+
+        for i in reversed(range(0, len(self.steps))):
+            step = self.steps[i]
+            if self.done[i] or not attrs.intersection(step.writes):
+                continue
+
+            indexes.append(i)
+            attrs.update(step.needs)
+
+        return indexes[::-1]
+
+    def run(self, targets=None):
+        """Runs every step, or only the steps needed for targets"""
+
+        if targets is None:
+            indexes = range(0, len(self.steps))
+        else:
+            indexes = self.needed(targets)
+
+        self.running = True
+        try:
+            for i in indexes:
+                if not self.done[i]:
+                    self.save_snapshots(i)
+                    self.run_step(i)
+                    self.done[i] = True
+        finally:
+            self.running = False
+
+    def save_snapshots(self, i):
+        for attr in self.steps[i].writes:
+            for j in range(0, i):
+                saved = self.snapshots.setdefault(j, {})
+                if self.done[j] or attr not in self.steps[j].reads or attr in saved:
+                    continue
+
+                value = getattr(self.table, attr, None)
+                saved[attr] = value.copy() if hasattr(value, "copy") else value
+
+    def run_step(self, i):
+        """Runs step i, with any attributes saved for it swapped in"""
+
+        saved = self.snapshots.pop(i, {})
+        current = {attr: getattr(self.table, attr) for attr in saved}
+
+        for attr, value in saved.items():
+            setattr(self.table, attr, value)
+
+        step = self.steps[i]
+        try:
+            with self.table.profiler.measure(step.name, self.table, step.writes):
+                step.run(self.table)
+        finally:
+            for attr, value in current.items():
+                setattr(self.table, attr, value)
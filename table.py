@@ -1,145 +1,242 @@
-import os
-import xlrd
 import numpy as np
 import pandas as pd
 import re
 
+from cells import build_cell_values
+from compact import compact_frame, release_frame, to_string_category
+from dataset import COLUMN_INFO_COLUMNS, DATASET_ROOT
+from footnotes import FootnoteIndex
+from header import parse_header
+from hierarchy import build_row_levels, fill_row_levels
+from hyphens import DICTIONARY_PATH
+from layout import FOOTNOTE, GENERAL_NOTE, SOURCE, SPECIAL_NOTE, detect_layout
+from locations import ROW_STUB_HEADS, find_places, holds_locations, lowest_labels
+from normalize import LABEL_RULES, OUTPUT_RULES, TextNormalizer
+from profiling import Profiler
+from region import DataRegion, blank_rows
+from steps import Step, StepRunner, per_frame
+from workbook import Workbook, column_letter
+from writers import SHEETS, write_frames
+from years import find_years
+
 # Table class
 
 
+FRAMES = ["table_info", "row_info", "col_info", "cell_info"]
+
+
 class Table():
     ROW_LEVELS = 7
     COL_LEVELS = 7
 
-    def __init__(self, file_directory):
-        self.filename = file_directory
-
-        # Read Excel workbook
-        self.book = xlrd.open_workbook(self.filename, formatting_info=True)
-        self.sheet = self.book.sheet_by_index(0)
-        self.font = self.book.font_list
-
-        res = re.match(r"Digest (\d{4}).*", self.sheet.name)
-        if res:
-            self.year = res.group(1)
-
-        self.id = self.get_id()
-        self.out_filename = self.get_out_filename()
-
-        self.raw_df = pd.read_excel(self.filename, header=None)
+    # ordered text rules, see normalize.py
+    LABEL_RULES = LABEL_RULES
+    OUTPUT_RULES = OUTPUT_RULES
 
-        self.title = self.get_title()
-        self.title_lines = self.get_title_lines()
-        self.header_lines = self.get_header_lines()
-
-        self.footnotes = self.get_footnotes()
+    # pipeline steps in the order they run, with the attributes each one
+    # reads and writes, so lazy tables only run what a frame depends on
+    STEPS = [
+        # data columns, with footnote and "!" columns folded in and
+        # standard error columns paired with their estimates
+        Step("read_data_region", result="data_region"),
 
         # Table Column dataframe
-        self.col_info = self.parse_col_info()
+        Step("parse_col_info", reads=["data_region"], result="col_info"),
 
         # Table Row dataframe
-        self.end_row = self.get_row_end()
-        self.row_info = self.parse_row_info()
+        Step("parse_row_info", reads=["data_region"], result="row_info"),
 
         # Table Info dataframe
-        self.table_info = self.parse_table_info()
+        Step("parse_table_info", reads=["row_info"], result="table_info"),
 
         # Cell info
-        self.cell_info = self.parse_cell_info()
+        Step("parse_cell_info", reads=["row_info"], result="cell_info"),
+
+        # Cell values, parsed before the data cells are cleaned
+        Step("parse_cell_values", reads=["row_info", "data_region"], result="cell_values"),
 
         # Add subtables to col_info
-        self.add_subtables_to_col()
+        Step("add_subtables_to_col", reads=["row_info"], writes=["col_info", "col_subtables"]),
 
         # removed
         # adds value_represents to col_info or cell_info
-        # self.find_value_represents()
-
-        # clean up row_info footnotes
-        self.clean_up_rowinfo()
+        # Step("find_value_represents")
 
         # gets location values of the table
         # sets table.info.location_in, row_info.location and/or col_info.location_type
-        self.find_location()
+        Step("find_location", reads=["table_info", "row_info"],
+             writes=["table_info", "row_info", "col_info"]),
 
         # drop if all null
-        self.drop_if_all_null()
-
-        # clean up multiple whitespace
-        self.clean_whitespace()
+        *per_frame("drop_if_all_null", ["table_info", "row_info", "col_info"]),
 
-        # remove all elipses
-        self.remove_ellipsis()
+        # clean up row_info footnotes, multiple whitespace and elipses
+        *per_frame("normalize_labels", FRAMES),
 
         # gets the year and adds table_info.year_in
         # sets table.info.year_in, row_info.year and/or col_info.year
-        self.find_table_year()
+        Step("find_table_year", reads=["row_info", "col_info"],
+             writes=["table_info", "row_info", "col_info"]),
 
         # convert all to string
-        self.convert_to_string()
-
-        # clean up empty paren
-        self.clean_empty_paren()
+        *per_frame("convert_to_string", FRAMES),
 
         # fix multi-cell row_levels
-        self.fix_multicell_rows()
+        Step("fix_multicell_rows", writes=["row_info"]),
 
         # fix 236.30 jurisdictions
-        # self.fix_jurisdictions()
+        # Step("fix_jurisdictions", writes=["row_info"])
 
         # remove spec char columns
-        self.remove_spec_char()
+        Step("remove_spec_char"),
 
         # add has_SE to the table_info tab
-        self.add_has_SE()
+        Step("add_has_SE", reads=["data_region"], writes=["table_info"]),
 
         # add column is_total
-        # self.add_col_is_total()
+        # Step("add_col_is_total", writes=["col_info"])
 
         # add standard_error
-        self.add_standard_error()
+        *per_frame("add_standard_error", ["col_info", "cell_info"], reads=["data_region"]),
 
         # add is_dollar
-        self.add_is_dollar()
+        *per_frame("add_is_dollar", ["col_info", "cell_info"]),
 
         # add format_string
-        self.add_format_string()
+        *per_frame("add_format_string", ["col_info", "cell_info"]),
 
-        # replace all nan with ""
-        self.clean_nan()
-
-        # deals with standard error columns
-        # sets table_info.has_SE
-        self.find_SE()
+        # pairs standard error columns with their estimates
+        # sets col_info.paired_column_index
+        Step("find_SE", reads=["data_region"], writes=["col_info"]),
 
         # sets the correct order of columns
-        self.order_cols()
+        Step("order_cols", writes=["col_info"]),
 
-        # clean hyphens based on dictionary words
-        self.clean_hyphens_dict()
+        # subtitle footnotes, read before references are removed
+        Step("get_subtitle_notes", reads=["table_info"], result="subtitle_notes"),
 
-        # replace "/ "
-        self.replace_slash_space()
+        # clean up empty paren, nan, hyphens, "/ " and footnote references
+        *per_frame("normalize_output", FRAMES),
 
         # add subtitle note field
-        self.add_subtitle_footnote()
+        Step("add_subtitle_footnote", reads=["subtitle_notes"], writes=["table_info"]),
 
         # remove extra row/col levels
-        self.remove_levels()
+        Step("remove_levels"),
 
         # remove col_level_2 from 213.10
-        self.remove_col()
+        Step("remove_col", writes=["col_info"]),
 
         # fix is_total in 203.65 and 303.30
-        self.fix_is_total()
+        Step("fix_is_total", writes=["row_info"]),
 
         # manually clean up 315.10
-        self.fix_315_10()
+        Step("fix_315_10", writes=["col_info"]),
+
+        # store repeated strings once when compact
+        *per_frame("compact_frame", FRAMES),
+    ]
+
+    def __init__(self, file_directory, label_rules=None, output_rules=None,
+                 dictionary_path=DICTIONARY_PATH, lazy=False, profile=False,
+                 profile_memory=True, compact=False, shared_columns=False):
+        self.filename = file_directory
+        self.dictionary_path = dictionary_path
+
+        # keep string columns as categoricals from convert_to_string on
+        self.compact = compact
+
+        # store col_info once plus a subtable mapping, see get_col_info
+        self.shared_columns = shared_columns
+        self.col_subtables = None
+
+        # per-step timings, see get_profile
+        self.profiler = Profiler(profile, profile_memory)
+
+        self.label_rules = self.LABEL_RULES if label_rules is None else label_rules
+        self.output_rules = self.OUTPUT_RULES if output_rules is None else output_rules
+
+        # Read Excel workbook
+        with self.profiler.measure("read_workbook"):
+            self.workbook = Workbook(self.filename)
+        self.book = self.workbook.book
+        self.sheet = self.workbook.sheet
+        self.font = self.workbook.font
+
+        # bold, indents and borders of columns A and B
+        with self.profiler.measure("get_style_index"):
+            self.styles = self.workbook.get_style_index()
+
+        res = re.match(r"Digest (\d{4}).*", self.sheet.name)
+        if res:
+            self.year = res.group(1)
+
+        self.id = self.get_id()
+        self.out_filename = self.get_out_filename()
+
+        self.raw_df = self.workbook.raw_df
+
+        self.title = self.get_title()
+
+        # title, header, data and note rows, raises LayoutError
+        with self.profiler.measure("detect_layout"):
+            self.layout = detect_layout(self.workbook.values, self.styles)
+        self.title_lines = self.layout.title_lines
+        self.header_lines = self.layout.header_end
+        self.end_row = self.layout.data_end
+
+        with self.profiler.measure("get_footnotes"):
+            self.footnotes = self.get_footnotes()
+
+            # footnote numbers referenced by every string of the sheet
+            self.footnote_refs = FootnoteIndex(
+                self.footnotes, (v for row in self.workbook.values for v in row))
+
+        # table_info, row_info, col_info, cell_info and cell_values
+        self.frames = {}
+        self.lazy = lazy
+        self.runner = StepRunner(self, self.STEPS)
+
+        # lazy tables build each frame the first time it is read
+        if not self.lazy:
+            self.runner.run()
+
+    def get_frame(self, name):
+        if self.lazy and not self.runner.running:
+            self.runner.run([name])
+
+        return self.frames[name]
+
+    def set_frame(self, name, df):
+        self.frames[name] = df
+
+    def get_profile(self):
+        """Returns the time, cpu, memory and frame size of each step run"""
+
+        profile = self.profiler.to_frame()
+        profile.insert(0, "table_id", self.id)
+        return profile
+
+    table_info = property(lambda self: self.get_frame("table_info"),
+                          lambda self, df: self.set_frame("table_info", df))
+    row_info = property(lambda self: self.get_frame("row_info"),
+                        lambda self, df: self.set_frame("row_info", df))
+    col_info = property(lambda self: self.get_frame("col_info"),
+                        lambda self, df: self.set_frame("col_info", df))
+    cell_info = property(lambda self: self.get_frame("cell_info"),
+                         lambda self, df: self.set_frame("cell_info", df))
+    cell_values = property(lambda self: self.get_frame("cell_values"),
+                           lambda self, df: self.set_frame("cell_values", df))
 
     def fix_315_10(self):
         if self.id == "315.10":
+            self.release_categories("col_info")
             self.col_info.loc[3, 'column_level_3'] = ''
 
     def fix_is_total(self):
+        if self.id in ["203.65", "303.40", "330.30"]:
+            self.release_categories("row_info")
+
         if self.id == "203.65":
             is_total = self.row_info['row_level_2'].str.strip() == 'Total'
             self.row_info['is_total'] = is_total
@@ -152,11 +249,7 @@ class Table():
                                                                       'row_level_1'].values
             self.row_info.loc[29:, 'row_level_1'] = 'All students'
 
-            is_bold = []
-            for i in range(5, 77):
-                cell_xf = self.sheet.cell(i, 0).xf_index
-                font_index = self.book.xf_list[cell_xf].font_index
-                is_bold.append(self.font[font_index].bold)
+            is_bold = self.styles.bold_a[5:77]
 
             is_total = ['TRUE' if x == 1 else 'FALSE' for x in is_bold]
 
@@ -190,138 +283,135 @@ class Table():
 
     def remove_col(self):
         if self.id == "213.10":
+            self.release_categories("col_info")
             self.col_info['column_level_2'] = self.col_info['column_level_3']
             self.col_info['column_level_3'] = ""
 
     def remove_levels(self):
         pass
 
-    def add_subtitle_footnote(self):
+    def get_subtitle_notes(self):
+        """Returns the footnotes referenced by each subtitle"""
+
         col = self.table_info["digest_table_sub_title"]
-        refs = col.str.extract(r"\\([0-9]),?([0-9])?\\")
-        refs = refs.replace(self.footnotes)
-        refs = refs.fillna("")
-        s = refs[0] + ":::" + refs[1]
-        s = s.replace(r":::$", "", regex=True)
-        self.table_info.insert(4, 'digest_table_sub_title_note', s)
-        self.table_info = self.table_info.replace(
-            r"\\([0-9]),?([0-9])?\\", "", regex=True)
-        self.row_info = self.row_info.replace(
-            r"\\([0-9]),?([0-9])?\\", "", regex=True)
-        self.col_info = self.col_info.replace(
-            r"\\([0-9]),?([0-9])?\\", "", regex=True)
-        self.cell_info = self.cell_info.replace(
-            r"\\([0-9]),?([0-9])?\\", "", regex=True)
-
-    def remove_ellipsis(self):
-        self.table_info = self.table_info.replace(' …', '', regex=True)
-        self.row_info = self.row_info.replace(' …', '', regex=True)
-        self.col_info = self.col_info.replace(' …', '', regex=True)
-        self.cell_info = self.cell_info.replace(' …', '', regex=True)
-
-        self.table_info = self.table_info.replace('…', '', regex=True)
-        self.row_info = self.row_info.replace('…', '', regex=True)
-        self.col_info = self.col_info.replace('…', '', regex=True)
-        self.cell_info = self.cell_info.replace('…', '', regex=True)
-
-    def replace_slash_space(self):
-        """Replaces all instances of '/ ' with '/' """
-
-        self.table_info = self.table_info.replace(r"/ ", "/", regex=True)
-        self.row_info = self.row_info.replace(r"/ ", "/", regex=True)
-        self.col_info = self.col_info.replace(r"/ ", "/", regex=True)
-
-    def clean_hyphens_dict(self):
-        """Cleans hyphens out of all tables based on provided dictionary"""
-
-        try:
-            hyphen_df = pd.read_csv("scraping_dictionary.csv")
-            hyphen_dict = dict(
-                zip(hyphen_df['hyphenated'], hyphen_df['corrected']))
-
-            self.table_info = self.table_info.replace(hyphen_dict, regex=True)
-            self.row_info = self.row_info.replace(hyphen_dict, regex=True)
-            self.col_info = self.col_info.replace(hyphen_dict, regex=True)
-            self.cell_info = self.cell_info.replace(hyphen_dict, regex=True)
-
-        except FileNotFoundError:
-            print("scraping_dictionary.csv is missing!")
+        return pd.Series(self.footnote_refs.notes(col), index=col.index)
+
+    def add_subtitle_footnote(self):
+        self.table_info.insert(
+            4, 'digest_table_sub_title_note', self.subtitle_notes)
+
+    def frame_parts(self, frame=None, frames=FRAMES):
+        """Returns (frame, attribute) pairs for a pass over one frame or all
+
+        With shared columns the subtable mapping gets every pass col_info
+        gets, the way its columns would inside the repeated col_info.
+        """
+
+        parts = []
+        for name in ([frame] if frame else frames):
+            parts.append((name, name))
+            if name == "col_info" and self.col_subtables is not None:
+                parts.append((name, "col_subtables"))
+
+        return parts
+
+    def normalize_text(self, rules, frame=None):
+        """Applies text rules to a dataframe, or all four, one pass per column"""
+
+        normalizer = TextNormalizer(rules, self.dictionary_path)
+
+        for name, attr in self.frame_parts(frame):
+            setattr(self, attr, normalizer.normalize(getattr(self, attr), name))
+
+    def normalize_labels(self, frame=None):
+        self.normalize_text(self.label_rules, frame)
+
+    def normalize_output(self, frame=None):
+        self.normalize_text(self.output_rules, frame)
 
     def order_cols(self):
-        cols = [
-            'digest_table_id', 'digest_table_year', 'digest_table_sub_id', 'digest_table_sub_title',
-            'column_index', 'is_standard_error', 'is_dollar', 'format_string', 'year', 'location', 'location_type',
-            'column_level_1', 'column_level_2', 'column_level_3', 'column_level_4', 'column_level_5',
-            'column_level_6', 'column_level_7', 'column_ref_note_1', 'column_ref_note_2', 'column_ref_note_3',
-            'column_ref_note_4', 'column_ref_note_5', 'column_ref_note_6', 'column_ref_note_7'
-        ]
+        cols = COLUMN_INFO_COLUMNS
+        if self.col_subtables is not None:
+            cols = [col for col in cols if col not in self.col_subtables.columns]
 
         self.col_info = self.col_info[cols]
 
     def add_col_is_total(self):
         self.col_info.insert(6, 'is_total', 'FALSE')
 
-    def add_standard_error(self):
-        self.col_info.insert(6, 'is_standard_error', 'FALSE')
-        self.cell_info.insert(4, 'is_standard_error', 'FALSE')
-
-    def add_is_dollar(self):
-        self.col_info.insert(6, 'is_dollar', '')
-        self.cell_info.insert(5, 'is_dollar', '')
-
-    def add_format_string(self):
-        self.col_info.insert(6, 'format_string', '')
-        self.cell_info.insert(6, 'format_string', '')
+    def add_standard_error(self, frame=None):
+        region = self.data_region
+        se_cols = [col for col, is_se in zip(region.columns, region.is_standard_error) if is_se]
+
+        if frame in [None, "col_info"]:
+            is_se = self.col_info['column_index'].isin(se_cols).to_numpy()
+            self.col_info.insert(6, 'is_standard_error', np.where(is_se, 'TRUE', 'FALSE'))
+        if frame in [None, "cell_info"]:
+            is_se = self.cell_info['column_index'].isin(se_cols).to_numpy()
+            self.cell_info.insert(4, 'is_standard_error', np.where(is_se, 'TRUE', 'FALSE'))
+
+    def add_is_dollar(self, frame=None):
+        if frame in [None, "col_info"]:
+            self.col_info.insert(6, 'is_dollar', '')
+        if frame in [None, "cell_info"]:
+            self.cell_info.insert(5, 'is_dollar', '')
+
+    def add_format_string(self, frame=None):
+        if frame in [None, "col_info"]:
+            self.col_info.insert(6, 'format_string', '')
+        if frame in [None, "cell_info"]:
+            self.cell_info.insert(6, 'format_string', '')
 
     def add_has_SE(self):
         has_SE = 'FALSE'
         if self.table_info['headnote'].values[0] == '[Standard errors appear in parentheses]':
             has_SE = 'TRUE'
+        if self.data_region.is_standard_error.any():
+            has_SE = 'TRUE'
         self.table_info.insert(4, 'has_SE', has_SE)
 
     def remove_spec_char(self):
         pass
 
-    def clean_whitespace(self):
-        self.table_info = self.table_info.replace(r"\s+", " ", regex=True)
-        self.row_info = self.row_info.replace(r"\s+", " ", regex=True)
-        self.col_info = self.col_info.replace(r"\s+", " ", regex=True)
-        self.cell_info = self.cell_info.replace(r"\s+", " ", regex=True)
-
-    def clean_nan(self):
-        self.table_info = self.table_info.replace("nan", "")
-        self.row_info = self.row_info.replace("nan", "")
-        self.col_info = self.col_info.replace("nan", "")
-        self.cell_info = self.cell_info.replace("nan", "")
-
-    def clean_empty_paren(self):
-        self.row_info = self.row_info.replace(r"\(\)", "", regex=True)
-
-    def drop_if_all_null(self):
-        self.table_info = self.table_info.dropna(axis=1, how="all")
-        self.row_info = self.row_info.dropna(axis=1, how="all")
-        self.col_info = self.col_info.dropna(axis=1, how="all")
+    def drop_if_all_null(self, frame=None):
         # do not remove all blank cell_info rows...this was causing empty tables to not appear
-        # self.cell_info = self.cell_info.dropna(axis=1, how="all")
+        for _, attr in self.frame_parts(frame, ["table_info", "row_info", "col_info"]):
+            setattr(self, attr, getattr(self, attr).dropna(axis=1, how="all"))
+
+    def convert_to_string(self, frame=None):
+        for _, attr in self.frame_parts(frame):
+            df = getattr(self, attr)
+            if self.compact:
+                df = df.copy()
+                for i in range(0, df.shape[1]):
+                    df.isetitem(i, to_string_category(df.iloc[:, i]))
+            else:
+                df = df.astype(str)
+            setattr(self, attr, df)
+
+    def compact_frame(self, frame=None):
+        if not self.compact:
+            return
 
-    def convert_to_string(self):
-        self.table_info = self.table_info.astype(str)
-        self.row_info = self.row_info.astype(str)
-        self.col_info = self.col_info.astype(str)
-        self.cell_info = self.cell_info.astype(str)
+        for _, attr in self.frame_parts(frame):
+            setattr(self, attr, compact_frame(getattr(self, attr)))
 
-    def clean_up_rowinfo(self):
-        self.row_info = self.row_info.replace(
-            r"(.*)\\[0-9]\\", r"\1", regex=True)
-        self.row_info = self.row_info.replace(
-            r"(.*)\\[0-9],[0-9]\\", r"\1", regex=True)
-        self.row_info = self.row_info.replace(r"(.*)!$", r"\1", regex=True)
+    def release_categories(self, frame):
+        """Lets a compact frame take values that are not categories yet"""
+
+        if self.compact:
+            setattr(self, frame, release_frame(getattr(self, frame)))
 
     def add_subtables_to_col(self):
         """Adds subtable id and subtable title to col_info dataframe"""
         sub_tables = self.row_info[[
             'digest_table_sub_id', 'digest_table_sub_title']].drop_duplicates()
 
+        # keep col_info once, get_col_info repeats it per subtable
+        if self.shared_columns:
+            self.col_subtables = sub_tables.reset_index(drop=True)
+            return
+
         df_list = []
 
         for index, row in sub_tables.iterrows():
@@ -336,6 +426,7 @@ class Table():
     def fix_multicell_rows(self):
         # specific table fix, until general solution is needed
         if self.id == "217.15":
+            self.release_categories("row_info")
             self.row_info.loc[13:18,
                               'row_level_1'] = 'Framing, floors, foundations--percent of schools with plans'
             self.row_info.loc[63:68,
@@ -405,18 +496,13 @@ class Table():
     def find_location(self):
         """finds and sets location_in, location, and location type"""
 
-        row_location_list = [
-            'Region and year',
-            'State',
-            'Name of district',
-            'State or jurisdiction',
-            'Region, state, and jurisdiction'
-        ]
+        row_levels = [f"row_level_{x+1}" for x in range(0, self.ROW_LEVELS)]
+        col_levels = [f"column_level_{x+1}" for x in range(0, self.COL_LEVELS)]
 
         # identify location by the stubhead
         location_in = ""
         stub_head = self.table_info['stub_head'].values[0].strip()
-        if stub_head in row_location_list:
+        if stub_head in ROW_STUB_HEADS:
             location_in = "Row"
 
         self.table_info.insert(4, "location_in", location_in)
@@ -432,13 +518,9 @@ class Table():
         self.col_info.insert(7, 'location_type', "")
 
         # location variable should be set to lowest level row_level
-        if location_in == "Row" and stub_head == "Region and year":
-            self.row_info['location'] = self.row_info.apply(
-                self.lowest_level, axis=1)
-            self.row_info['location_type'] = "Region"
-        elif location_in == "Row":
-            self.row_info['location'] = self.row_info.apply(
-                self.lowest_level, axis=1)
+        if location_in == "Row":
+            self.row_info['location'] = lowest_labels(self.row_info, row_levels)
+            self.row_info['location_type'] = ROW_STUB_HEADS[stub_head] or stub_head
 
             # fixes issue with 'United States' appearing in the is_total row of table
             # is_total = self.row_info['is_total'] == 'TRUE'
@@ -446,7 +528,23 @@ class Table():
 
             # self.row_info.loc[is_total, 'location'] = self.row_info.loc[is_total, 'row_level_1']
 
-            self.row_info['location_type'] = stub_head
+        # otherwise places named in the row labels, then the column labels,
+        # when most of them are places or some are states
+        if location_in == "":
+            location, location_type = find_places(self.row_info, row_levels)
+            if holds_locations(self.row_info, row_levels, location, location_type):
+                location_in = "Row"
+                self.row_info['location'] = location
+                self.row_info['location_type'] = location_type
+
+        if location_in == "":
+            location, location_type = find_places(self.col_info, col_levels)
+            if holds_locations(self.col_info, col_levels, location, location_type):
+                location_in = "Column"
+                self.col_info['location'] = location
+                self.col_info['location_type'] = location_type
+
+        self.table_info['location_in'] = location_in
 
         if (location_in not in ['Row', 'Column']):
             location_in = "Title"
@@ -454,14 +552,6 @@ class Table():
             self.table_info['location'] = "United States"
             self.table_info['location_type'] = "Region"
 
-    def lowest_level(self, row):
-        location = ""
-        row_levels = [f"row_level_{x}" for x in range(1, 8)]
-        for row_level in row_levels:
-            if row[row_level] != "" and not re.search(r"\s*(\d{4})\s*", row[row_level]):
-                location = row[row_level]
-        return location
-
     def find_table_year(self):
         """finds and sets year_in, and year values"""
         # check title for year
@@ -496,10 +586,7 @@ class Table():
         # finds rows matching year format
         if year_in == "":
             row_list = [f"row_level_{i+1}" for i in range(0, self.ROW_LEVELS)]
-            year_col = []
-
-            for index, row in self.row_info.iterrows():
-                year_col.append(self.get_year(row[row_list]))
+            year_col = find_years(self.row_info, row_list)
 
             year_series = pd.Series(year_col)
             year_series = year_series.replace('', np.nan)
@@ -513,10 +600,7 @@ class Table():
         if year_in == "":
             col_list = [
                 f"column_level_{i+1}" for i in range(0, self.COL_LEVELS)]
-            year_col = []
-
-            for index, row in self.col_info.iterrows():
-                year_col.append(self.get_year(row[col_list]))
+            year_col = find_years(self.col_info, col_list)
 
             year_series = pd.Series(year_col)
             year_series = year_series.replace('', np.nan)
@@ -530,34 +614,13 @@ class Table():
             year_in = "Title"
             self.table_info['year_in'] = year_in
 
-    def get_year(self, series):
-        """Helper function to get year matches from a series"""
-
-        year1 = series.str.extract(r"^\s*(\d{4})\s*$")
-        year2 = series.str.extract(r".*(\d{4}–\d{2})\s*$")
-        year3 = series.str.extract(r".*(\d{4}-\d{2})\s*$")
-        year4 = series.str.extract(r".*(\d{4}–\d{4})")
-        year5 = series.str.extract(r".*(\d{4}-\d{4})")
-        year5 = series.str.extract(r".*(\d{4}-\d{2}) \(.*")
-        year6 = series.str.extract(r".*(\d{4} to \d{4}).*")
-        year7 = series.str.extract(r".*([Ff]all \d{4}).*")
-        year8 = series.str.extract(r".*([Ss]pring \d{4}).*$")
-        year9 = series.str.extract(r", (\d{4})\s*$")
-        year10 = series.str.extract(r".*(\d{4}-\d{2} to \d{4}-\d{2}).*")
-        year11 = series.str.extract(r".*(\d{4}-\d{2}), total$")
-
-        years_df = pd.concat([
-            year1, year2, year3, year4, year5, year6, year7, year8, year9, year10, year11
-        ], axis=1)
-
-        years_series = years_df.apply(
-            lambda x: ','.join(x.dropna().astype(str)), axis=1)
-
-        return ''.join(years_series).split(',')[-1]
-
     def find_SE(self):
-        """finds and sets has_SE"""
-        pass
+        """Adds the column each standard error column pairs with, and the
+        other way around, to col_info"""
+
+        pairs = self.data_region.get_pairs()
+        paired = [pairs.get(col, '') for col in self.col_info['column_index'].astype(str)]
+        self.col_info.insert(7, 'paired_column_index', paired)
 
     def get_id(self):
         tnum = ""
@@ -589,31 +652,11 @@ class Table():
 
         return title
 
-    def get_title_lines(self):
-        tlines = 1
+    def get_headnote(self):
+        """Returns the line under the title, like "[Standard errors appear
+        in parentheses]", or "" """
 
-        if re.match(r"\s*\[.*\]\s*", self.sheet.cell_value(1, 0)):
-            tlines = 2
-
-        return tlines
-
-    def AA(self, num, string):
-        """Recursively builds column index
-
-        Inspired by from this Stackoverflow answer:
-        https://stackoverflow.com/a/54837286
-        """
-
-        r = num % 26
-        num = (num - r) // 26
-        string = chr(ord("A") + r) + string
-
-        if num > 26:
-            string = self.AA(num, string)
-        elif num > 0:
-            string = chr(ord("A") + num - 1) + string
-
-        return string
+        return self.sheet.cell_value(1, 0) if self.title_lines == 2 else ""
 
     def parse_table_info(self):
         """Returns table_info dataframe"""
@@ -622,24 +665,23 @@ class Table():
         df = self.raw_df
         tlines = self.title_lines
 
-        # headnote
-        headnote = sh.cell_value(1, 0) if tlines == 2 else ""
+        headnote = self.get_headnote()
 
         # stub_head
         stub_head = sh.cell_value(tlines, 0)
 
         # general_note
         general_note = ""
-        general = df[0].str.extract(r"NOTE: (.*)").dropna()
-        if (not general.empty):
-            general_note = general[0].values[0].strip()
+        if self.layout.note_row is not None:
+            general = GENERAL_NOTE.search(df.loc[self.layout.note_row, 0])
+            general_note = general.group(1).strip()
 
         # source
-        source = df[0].str.extract(r"SOURCE: (.*)\((.*)\)").dropna()
-        source_note = source[0].values[0].strip()
+        source = SOURCE.search(df.loc[self.layout.source_row, 0])
+        source_note = source.group(1).strip()
 
         # last_prepared
-        last_prepared = source[1].values[0].strip()
+        last_prepared = source.group(2).strip()
 
         col_list = [
             'digest_table_id',
@@ -674,16 +716,6 @@ class Table():
 
         return tb_info
 
-    def get_header_lines(self):
-        """Returns the index of the last row of the header"""
-
-        for row in range(0, self.sheet.nrows):
-            if self.sheet.cell_value(row, 0) == 1 or self.sheet.cell_value(row, 0) == "1":
-                return row
-
-        print("End of file reached, no integer row")
-        return 0
-
     # def is_empty(self, series):
     #     """Returns True if row or column is empty"""
 
@@ -696,33 +728,14 @@ class Table():
     #     cols = [not self.is_empty(self.raw_df.iloc[:, col]) for col in range(0, self.sheet.ncols)]
     #     return list(self.raw_df.loc[:, cols].columns)
 
-    def get_header(self):
-
-        # get list of non-empty columns
-        # cols = self.get_nonempty_cols()
-        cols = list(range(0, self.sheet.ncols))
-
-        header = pd.read_excel(self.filename,
-                               skiprows=self.title_lines,
-                               header=None,
-                               nrows=self.header_lines - self.title_lines,
-                               usecols=cols
-                               )
-
-        # drop the first column
-        header = header.iloc[:, 1:]
-
-        header = header.ffill(axis=0).ffill(axis=1)
-        return pd.MultiIndex.from_arrays(header.values)
-
     def get_footnotes(self):
         """Returns footnotes dict"""
 
         df = self.raw_df
 
-        # Extract footnotes from raw df
-        footnotes = df[0].str.extract(
-            r"\\([0-9]+)\\(.*)").dropna().set_index(0)
+        # Extract footnotes from the notes below the data
+        notes = df.loc[self.layout.footnote_rows, 0].astype(str)
+        footnotes = notes.str.extract(FOOTNOTE).dropna().set_index(0)
         return footnotes.to_dict()[1]
 
     def get_special_notes(self):
@@ -749,8 +762,8 @@ class Table():
 
         # return dict(zip(symbols, footnotes))
 
-        s = self.raw_df[0]
-        spec_notes = s.str.extract(r"^(---|[†‡#!])(.*)").dropna().set_index(0)
+        s = self.raw_df.loc[self.layout.special_note_rows, 0].astype(str)
+        spec_notes = s.str.extract(SPECIAL_NOTE).dropna().set_index(0)
         spec_dict = spec_notes.to_dict()[1]
 
         paren_entries = {}
@@ -761,235 +774,55 @@ class Table():
 
         return spec_dict
 
-    def parse_col_info(self):
-        """Returns dataframe with column information"""
+    def read_data_region(self):
+        """Returns the data columns, see region.py"""
 
-        header = self.get_header()
-        footnotes_dict = self.get_footnotes()
+        return DataRegion(self.raw_df, self.header_lines + 1, self.end_row,
+                          self.title_lines, self.get_headnote())
 
-        # remove duplicated column levels
-        col_info = header.to_frame(index=False)
-        is_duplicate = col_info.apply(lambda row: row.duplicated(), axis=1)
-        col_info = col_info.where(~is_duplicate, "")
+    def parse_col_info(self):
+        """Returns dataframe with column information"""
 
-        # create extra columns for unused columns index levels
-        for n in range(col_info.shape[1], self.COL_LEVELS):
-            col_info.insert(n, n, "")
+        # header rows without the stub column
+        header = self.workbook.to_frame(self.title_lines, self.header_lines)
+        header = header.iloc[:, 1:]
 
-        # label column levels
-        col_info.columns = [
-            f"column_level_{col+1}" for col in col_info.columns]
+        # one row per data column
+        col_info = parse_header(header, self.footnote_refs, self.COL_LEVELS,
+                                self.data_region.sheet_columns - 1)
 
         # add table_id and table_year to col_info
-        col_info["digest_table_id"] = self.id
-        col_info["digest_table_year"] = self.year
-
-        # # create column_ref_note columns
-        # for x in range(0, self.COL_LEVELS):
-        #     col = col_info[f"column_level_{x + 1}"].astype(str)
-
-        #     # create a reference column with the footnote number
-        #     refs = col.str.extract(r"\\([0-9])\\")
-
-        #     # create new column with the reference note
-        #     col_info[f"column_ref_note_{x + 1}"] = refs.replace(footnotes_dict)
-
-        #     # delete footnote from column_level_x
-        #     col_level = col.str.replace(r"\\[0-9]\\", "")
-
-        #     col_info[f"column_level_{x + 1}"] = col_level
-
-        for x in range(0, self.COL_LEVELS):
-            col = col_info[f"column_level_{x+1}"].astype(str)
-
-            # create a reference column with the footnote number
-            refs = col.str.extract(r"\\([0-9]+),?([0-9]*)\\")
-            refs = refs.replace(self.footnotes)
-            refs = refs.fillna("")
-            s = refs[0] + ":::" + refs[1]
-            s = s.replace(regex=r":::$", value="")
-
-            # create new column with the reference note
-            col_info[f"column_ref_note_{x+1}"] = s
-
-            # delete footnote from col_level_x
-            new_col = col.str.replace(
-                r"\\([0-9]+),?([0-9]*)\\", "", regex=True).str.strip()
-            col_info[f"column_level_{x+1}"] = new_col
-
-        # Remove extra headers
-        col_info = col_info.fillna("")
-
-        # Drop duplicated rows in header
-        col_info = col_info.drop_duplicates().reset_index()
-
-        # create column_index field
-        col_info["column_index"] = [self.AA(i, "") for i in col_info.index]
-
-        # list of columns in the desired order
-        col_list = [
-            [f"column_level_{x + 1}", f"column_ref_note_{x + 1}"] for x in range(0, 7)]
-        col_list = list(np.array(col_list).flatten())
-
-        # rearrange column order
-        col_info = col_info[
-            ['digest_table_id', 'digest_table_year', 'column_index'] +
-            col_list
-        ]
-
-        # strip and replace \n
-        for col in range(0, col_info.shape[1]):
-            new_col = col_info.iloc[:, col].str.strip()
-            new_col = new_col.str.replace(r"\.\.+", "", regex=True)
-            new_col = new_col.str.replace("/\n", "/")
-            new_col = new_col.str.replace("\n", " ")
-            new_col = new_col.str.replace("- ", "")
-            col_info.iloc[:, col] = new_col
-
-        # remove YYYY.0 from years
-        col_info = col_info.replace(r"^(\d{4})\.0$", r"\1", regex=True)
+        col_info.insert(0, "digest_table_id", self.id)
+        col_info.insert(1, "digest_table_year", self.year)
 
         return col_info
 
-    def get_row_end(self):
-
-        xf_list = self.book.xf_list
-
-        for row in range(self.header_lines + 2, self.sheet.nrows):
-            idx = self.sheet.cell_xf_index(row, 0)
-            top_line_style = xf_list[idx].border.top_line_style
-            bottom_line_style = xf_list[idx].border.bottom_line_style
-
-            # print(str(row) + ": " + str(self.sheet.cell(row, 0).value) + str(top_line_style) +
-            #       ", " + str(bottom_line_style))
-            if top_line_style == 1:
-                return row - 1
-            elif bottom_line_style == 1:
-                return row
-
-        print("Error: No data end row")
-        return 0
-
-    def get_leading_spaces(self, string):
-        string = str(string)
-        res = re.search(r"[^ ]", string)
-
-        if res:
-            return res.start()
-        else:
-            return 0
-
     def parse_row_info(self):
-        total_level = 0
-        # super_total_level = 0
-        bold_level = 0
-        indent_level = 0
-        rows = self.end_row - self.header_lines
-        subtitle = ""
-
-        empty = np.empty([rows, self.ROW_LEVELS])
-        empty[:] = np.NaN
-
-        row_levels = pd.DataFrame(empty,
-                                  index=range(self.header_lines+1, self.end_row+1))
-
-        for row in range(self.header_lines + 1, self.end_row + 1):
-            cell = self.sheet.cell(row, 0)
-            cell_xf = self.book.xf_list[cell.xf_index]
-            is_bold = bool(self.font[cell_xf.font_index].bold)
-            is_empty = bool(cell.value == "")
-            indents = self.get_leading_spaces(cell.value)
-            is_total = is_bold and (indents == 3 or indents == 5)
-            # is_super_total = is_bold and indents == 5
-
-            # identify end of total (double lines) above
-            cell_above = self.sheet.cell(row-1, 1)
-            cell_above_xf = self.book.xf_list[cell_above.xf_index]
-            cell_above_btm_border = cell_above_xf.border.bottom_line_style
-
-            cell_over = self.sheet.cell(row, 1)
-            cell_over_xf = self.book.xf_list[cell_over.xf_index]
-            cell_over_top_border = cell_over_xf.border.top_line_style
-
-            # reset total_level back to 0
-            if cell_above_btm_border == 6 or cell_over_top_border == 6:
-                indents_above = self.get_leading_spaces(
-                    self.sheet.cell(row-1, 0).value)
-                if not indents_above == 5:
-                    total_level = max(total_level-1, 0)
-
-            # Concats cell.value for multi-row cells
-            cell_value = cell.value
-            if indents == 3 and not is_bold:
-                cell_value = self.sheet.cell(row-1, 0).value + cell.value
-
-            # identifying subtable titles
-            if is_empty and self.sheet.cell(row, 1).value.strip() != "":
-                subtitle = self.sheet.cell(row, 1).value
-
-            if indents in [0, 3, 5]:
-                indent_level = 0
-            else:
-                indent_level = indents / 2
-
-            # if is_super_total:
-            #     super_total_level = max(super_total_level-1, 0)
-            #     row_levels.loc[row, "subtitle"] = subtitle
-            #     row_levels.loc[row, "is_total"] = "TRUE"
-            #     row_levels.loc[row, super_total_level] = cell_value
-            #     super_total_level += 1
-            if is_total:
-                row_levels.loc[row, "subtitle"] = subtitle
-                row_levels.loc[row, "is_total"] = "TRUE"
-                row_levels.loc[row, total_level+bold_level] = cell_value
-                total_level += 1
-            elif is_bold:
-                bold_level = max(bold_level-1, 0)
-                row_levels.loc[row, "subtitle"] = subtitle
-                row_levels.loc[row, "is_total"] = "FALSE"
-                row_levels.loc[row, total_level +
-                               bold_level+indent_level] = cell_value
-                bold_level += 1
-            else:
-                row_levels.loc[row, "subtitle"] = subtitle
-                row_levels.loc[row, "is_total"] = "FALSE"
-                row_levels.loc[row, total_level +
-                               max(bold_level, indent_level)] = cell_value
+        row_levels = build_row_levels(self.styles,
+                                      self.header_lines + 1,
+                                      self.end_row,
+                                      self.ROW_LEVELS)
 
-        # forward fill row levels
-        row_levels = row_levels.replace('', np.nan)
-        row_levels = row_levels.ffill(axis=1).ffill(axis=0)
-        is_duplicate = row_levels.apply(lambda row: row.duplicated(), axis=1)
-        row_levels = row_levels.where(~is_duplicate, "")
+        # forward fill row levels, blank repeated labels
+        row_levels = fill_row_levels(row_levels)
 
         # rename columns
         row_levels.columns = [
             f"row_level_{col+1}" for col in range(0, 7)] + ["digest_table_sub_title", "is_total"]
 
-        # create row_ref_note columns
+        # split footnote references off into row_ref_note columns
         for x in range(0, self.ROW_LEVELS):
             col = row_levels[f"row_level_{x+1}"].astype(str)
+            level, note = self.footnote_refs.split_values(col)
 
-            # create a reference column with the footnote number
-            refs = col.str.extract(r"\\([0-9]+),?([0-9]*)\\")
-            refs = refs.replace(self.footnotes)
-            refs = refs.fillna("")
-            s = refs[0] + ":::" + refs[1]
-            s = s.replace(regex=r":::$", value="")
-
-            # create new column with the reference note
-            row_levels[f"row_ref_note_{x+1}"] = s
-
-            # delete footnote from row_level_x
-            new_col = col.str.replace(
-                r"\\([0-9]+),?([0-9]*)\\", "", regex=True).str.strip()
-            row_levels[f"row_level_{x+1}"] = new_col
+            row_levels[f"row_ref_note_{x+1}"] = note
+            row_levels[f"row_level_{x+1}"] = level
 
         row_levels = row_levels.fillna("")
 
         # generate subtable ids
         subtable_titles = row_levels['digest_table_sub_title'].unique()
-        subtable_ids = [self.AA(i, "") for i in range(0, len(subtable_titles))]
+        subtable_ids = [column_letter(i) for i in range(0, len(subtable_titles))]
         subtable_dict = dict(zip(subtable_titles, subtable_ids))
         row_levels['digest_table_sub_id'] = row_levels['digest_table_sub_title'].replace(
             subtable_dict)
@@ -1023,51 +856,15 @@ class Table():
             new_col = new_col.str.replace("- ", "")
             row_levels.iloc[:, col] = new_col
 
-        # Clean up footnotes columns
-        df_fn = self.raw_df.loc[:, 1:].copy().fillna('').astype(str)
-        fn_cols = df_fn.apply(lambda x: self.is_fn_col(x), axis=0)
-
-        for i in fn_cols.index:
-            if fn_cols[i]:
-                fn_col = df_fn.loc[:, i].fillna("").astype(str)
-                prev_col = df_fn.loc[:, i-1].fillna("").astype(str)
-                df_fn.loc[:, i-1] = prev_col + fn_col
+        # data columns, footnote and "!" columns folded into their values
+        data = self.data_region.values
 
-        # Clean up special note columns
-        sn_cols = df_fn.apply(lambda x: self.is_spec_note_col(x), axis=0)
-
-        for i in sn_cols.index:
-            if sn_cols[i]:
-                sn_col = df_fn.loc[:, i].fillna("")
-                prev_col = df_fn.loc[:, i-1].fillna("").astype(str)
-                df_fn.loc[:, i-1] = prev_col + sn_col
-
-        # remove footnote only cols
-        df_fn = df_fn.loc[:, ~fn_cols]
-
-        # remove special note only cols
-        df_fn = df_fn.loc[:, ~sn_cols]
-
-        # remove empty cols
-        df_fn = df_fn.dropna(axis=1, how='all')
-
-        df_fn.columns = range(0, df_fn.shape[1])
-
-        # merge with row data and rename columns
-        df = pd.merge(row_levels, df_fn, how='left',
+        # merge with row data
+        df = pd.merge(row_levels, data, how='left',
                       left_index=True, right_index=True)
-        col_names = list(range(0, df_fn.shape[1]))
-        col_names_new = [self.AA(i, "") for i in range(0, df_fn.shape[1])]
-        col_names_dict = dict(zip(col_names, col_names_new))
-        df = df.rename(columns=col_names_dict)
 
-        # drop row if all NaN in data
-        drop_rows = df.loc[:, 'B':].apply(
-            lambda x: self.na_or_empty(x), axis=1)
-        df = df[~drop_rows]
-
-        # drop_cols = df.loc[:, 'A':].apply(lambda x: self.na_or_empty(x), axis=0)
-        # df = df.loc[:, ~drop_cols]
+        # drop row if all empty in data
+        df = df[~blank_rows(df.loc[:, data.columns])]
 
         # drop row if contains NaN
         # df = df.dropna()
@@ -1080,144 +877,113 @@ class Table():
 
         return df
 
-    def na_or_empty(self, row):
-        is_na = row.isna()
-        is_space = row.astype(str).str.match(r"^\s*$")
-        is_empty = (is_na | is_space).all()
-        return is_empty
-
-    def is_fn_col(self, col):
-        """col contains only footnotes"""
-        return col.str.match(r"^\\[0-9]\\$").any()
-
-    def is_spec_note_col(self, col):
-        """col contains only special notes"""
-        return col.str.match(r"!").any()
-
     def parse_cell_info(self):
 
         data = self.row_info.loc[:, 'A':]
 
-        col_list = [
+        label_cols = [
             'digest_table_id',
             'digest_table_year',
             'digest_table_sub_id',
             'digest_table_sub_title',
             'row_index',
-            'column_index',
-            'cell_note',
         ]
-        cell_info = pd.DataFrame(columns=col_list)
 
         symbol_dict = self.get_special_notes()
-
-        for row in data.index:
-            for col in data.columns:
-
-                cell_val = str(data.loc[row, col]).strip()
-
-                has_fn = re.match(r".*\\([0-9])\\", cell_val)
-                has_multi_fn = re.match(r".*\\([0-9]),([0-9])\\", cell_val)
-                is_spec = cell_val in list(symbol_dict.keys())
-                has_exclam = re.match(r".*!$", cell_val)
-
-                cell_note_1 = ""
-                cell_note_2 = ""
-                # ref_note = ""
-                # spec_note = ""
-
-                if has_fn:
-                    cell_note_1 = has_fn.group(1)
-                if has_multi_fn:
-                    cell_note_1 = self.footnotes[has_multi_fn.group(1)]
-                    cell_note_2 = self.footnotes[has_multi_fn.group(2)]
-                if is_spec:
-                    cell_note_1 = symbol_dict[cell_val]
-                if has_exclam:
-                    cell_note_1 = 'Interpret data with caution. The coefficient of variation (CV) for this estimate is between 30 and 50 percent.'
-                if has_fn or is_spec or has_exclam:
-                    l = list(self.row_info.loc[row, ['digest_table_id',
-                                                     'digest_table_year',
-                                                     'digest_table_sub_id',
-                                                     'digest_table_sub_title',
-                                                     'row_index']].values) + [col, cell_note_1]
-                    df_row = pd.DataFrame(l, index=col_list).T
-                    cell_info = cell_info.append(df_row, ignore_index=True)
-                if has_multi_fn:
-                    l1 = list(self.row_info.loc[row, ['digest_table_id',
-                                                      'digest_table_year',
-                                                      'digest_table_sub_id',
-                                                      'digest_table_sub_title',
-                                                      'row_index']].values) + [col, cell_note_1]
-                    df_row = pd.DataFrame(l1, index=col_list).T
-                    cell_info = cell_info.append(df_row, ignore_index=True)
-
-                    l2 = list(self.row_info.loc[row, ['digest_table_id',
-                                                      'digest_table_year',
-                                                      'digest_table_sub_id',
-                                                      'digest_table_sub_title',
-                                                      'row_index']].values) + [col, cell_note_2]
-                    df_row = pd.DataFrame(l2, index=col_list).T
-                    cell_info = cell_info.append(df_row, ignore_index=True)
-
-        # replaces single footnote cells
-        cell_info['cell_note'] = cell_info['cell_note'].replace(self.footnotes)
+        exclam_note = 'Interpret data with caution. The coefficient of variation (CV) for this estimate is between 30 and 50 percent.'
+
+        # every data cell, row by row, as one series
+        cells = pd.Series(data.to_numpy(dtype=object).ravel())
+        cells = cells.astype(str).str.strip()
+
+        # notes of each distinct cell value: one for a symbol or "!", then
+        # one for each footnote it references
+        codes, values = pd.factorize(cells.to_numpy(dtype=object))
+
+        value_notes = []
+        for value in values:
+            notes = []
+            if value.endswith("!"):
+                notes.append(exclam_note)
+            elif value in symbol_dict:
+                notes.append(symbol_dict[value])
+            notes.extend(self.footnote_refs.get_texts(value))
+            value_notes.append(notes)
+
+        counts = np.array([len(notes) for notes in value_notes], dtype=np.int64)
+        starts = np.cumsum(counts) - counts
+        all_notes = np.array([note for notes in value_notes for note in notes], dtype=object)
+
+        # one row per note of each cell, in cell order
+        cell_counts = counts[codes]
+        cell = np.repeat(np.arange(len(cells)), cell_counts)
+        position = np.arange(len(cell)) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+        notes = all_notes[starts[codes][cell] + position]
+
+        rows = cell // data.shape[1]
+        cols = cell % data.shape[1]
+
+        labels = self.row_info[label_cols].to_numpy(dtype=object)[rows]
+
+        cell_info = pd.DataFrame({
+            **{col: labels[:, i] for i, col in enumerate(label_cols)},
+            'column_index': data.columns.to_numpy(dtype=object)[cols],
+            'cell_note': notes,
+        }, dtype=object)
 
         return cell_info
 
+    def parse_cell_values(self):
+        """Returns the data cells as numbers in long form, see cells.py"""
+
+        return build_cell_values(self.row_info, self.data_region.columns,
+                                 self.footnote_refs, self.data_region.estimates)
+
     def write_xlsx(self):
         """Writes to output file"""
 
-        with pd.ExcelWriter(self.out_filename) as writer:  # pylint: disable=abstract-class-instantiated
+        self.write_output("xlsx")
+
+    def write_output(self, output_format="xlsx", destination=None):
+        """Writes the four frames as xlsx sheets, or csv, jsonl or parquet files
+
+        The dataset format appends them to the corpus datasets under
+        destination, see dataset.py.
+        """
+
+        if destination is None:
+            destination = DATASET_ROOT if output_format == "dataset" else self.out_filename
 
-            # table info
-            table_info = self.table_info.T.reset_index().T
+        return write_frames(self.frames_for_output(), destination, output_format)
 
-            table_info.to_excel(
-                writer,
-                sheet_name="table_info",
-                index=False,
-                header=False
-            )
+    def frames_for_output(self):
+        frames = {attr: getattr(self, attr) for attr, _ in SHEETS}
+        frames["col_info"] = self.get_col_info()
+        return frames
 
-            # rows
-            row_info = self.row_info.T.reset_index().T
+    def get_col_info(self):
+        """Returns col_info with its rows repeated for every subtable
 
-            row_info.to_excel(
-                writer,
-                sheet_name="row_info",
-                index=False,
-                header=False
-            )
+        Same frame add_subtables_to_col builds when columns are not shared.
+        """
 
-            # reset column headers so they are part of the dataframe
-            col_info = self.col_info.T.reset_index().T
+        col_info = self.col_info
+        if self.col_subtables is None:
+            return col_info
 
-            col_info.to_excel(
-                writer,
-                sheet_name="column_info",
-                index=False,
-                header=False
-            )
+        n = col_info.shape[0]
+        k = self.col_subtables.shape[0]
 
-            cell_info = self.cell_info.T.reset_index().T
+        df = col_info.iloc[np.tile(np.arange(0, n), k)]
+        sub = self.col_subtables.iloc[np.repeat(np.arange(0, k), n)]
 
-            cell_info.to_excel(
-                writer,
-                sheet_name="cell_info",
-                index=False,
-                header=False
-            )
+        for i, col in enumerate(['digest_table_sub_id', 'digest_table_sub_title']):
+            df.insert(2 + i, col, sub[col].array)
+
+        return df
 
 
 if __name__ == "__main__":
-    directory = "100tables/"
-    for filename in os.listdir(directory):
-        try:
-            if filename.endswith(".xls"):
-                file_directory = os.path.join(directory, filename)
-                table = Table(file_directory)
-                print(table.id)
-                table.write_xlsx()
-        except:
-            print('An error occurred in ' + filename)
+    # see batch.py for workers, timeouts and the failure report
+    from batch import run_batch
+    run_batch("100tables/")
@@ -0,0 +1,289 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+import xlwt
+
+from generate_tables import generate_table
+from table import Table
+
+# Parses synthetic and hand made tables and compares row_info, col_info and
+# cell_info to the csv files in test_data/. After a change that is meant to
+# alter the output, write new baselines with
+#
+#   python table_regression_test.py --update
+#
+# and review the diff of test_data/ before committing it.
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
+
+FRAMES = ["row_info", "col_info", "cell_info"]
+
+SOURCE = "SOURCE: U.S. Department of Education. (This table was prepared May 2019.)"
+
+
+def write_sheet(path, number, title, headnote, stub_head, headers, rows, notes=()):
+    """Writes a Digest style table: title, headnote, header rows, a row
+    numbering the columns, stub rows and notes under a single border
+
+    headers is a list of header rows, rows a list of (label, bold, values).
+    """
+
+    wb = xlwt.Workbook(encoding="utf-8")
+    ws = wb.add_sheet(f"Digest 2019 Table {number}")
+    plain = xlwt.easyxf("")
+    bold = xlwt.easyxf("font: bold on")
+    ncols = max(len(h) for h in headers) + 1
+
+    ws.write(0, 0, f"Table {number}. {title}")
+    ws.write(1, 0, headnote)
+    ws.write(2, 0, stub_head)
+    for r, header in enumerate(headers):
+        for c, label in enumerate(header):
+            ws.write(2 + r, c + 1, label)
+
+    row = 2 + len(headers)
+    for c in range(0, ncols):
+        ws.write(row, c, c + 1)
+    row += 1
+
+    for label, is_bold, values in rows:
+        ws.write(row, 0, label, bold if is_bold else plain)
+        for c, value in enumerate(values):
+            ws.write(row, c + 1, value)
+        row += 1
+
+    for c in range(0, ncols):
+        ws.write(row, c, "", xlwt.easyxf("borders: top thin"))
+    for i, note in enumerate(list(notes) + [SOURCE]):
+        ws.write(row + 1 + i, 0, note)
+
+    wb.save(path)
+    return path
+
+
+def change_table(path):
+    # parenthesized numbers that are falls, not standard errors
+    return write_sheet(
+        path, "910.10", "Enrollment, by sex: Fall 2018 and change from 2017",
+        "[In thousands]", "Sex",
+        [["Enrollment", "Enrollment"], ["Amount", "Change"]],
+        [("   Total", True, ["100", "(5)"]),
+         ("Male", False, ["50", "(2)"]),
+         ("Female", False, ["50", "(3)\\1\\"]),
+         ("Another gender", False, ["†", "(†)"])],
+        notes=["†Not applicable.", "\\1\\Includes imputations."])
+
+
+def state_row_table(path):
+    return write_sheet(
+        path, "910.20", "Number of public schools, by state: 2017-18",
+        "", "State",
+        [["Schools", "Schools"], ["Elementary", "Secondary"]],
+        [("   United States", True, ["67,408", "23,814"]),
+         ("Alabama", False, ["856", "368"]),
+         ("Alaska", False, ["173", "96"]),
+         ("Arizona", False, ["1,227", "540"]),
+         ("Arkansas", False, ["618", "367"])])
+
+
+def state_column_table(path):
+    return write_sheet(
+        path, "910.30", "Pupil/teacher ratio in public schools, by level: 2017-18",
+        "", "Level",
+        [["Alabama", "Alaska", "Arizona", "Arkansas"]],
+        [("   All schools", True, ["17.1", "16.6", "23.0", "13.6"]),
+         ("Elementary", False, ["17.6", "17.1", "22.4", "14.1"]),
+         ("Secondary", False, ["16.2", "15.9", "24.5", "12.8"])])
+
+
+def region_breakdown_table(path):
+    # a few regions among other characteristics, the table is national
+    return write_sheet(
+        path, "910.40", "Enrollment, by sex and region: 2019",
+        "[In thousands]", "Characteristic",
+        [["Enrollment", "Enrollment"], ["Amount", "Percent"]],
+        [("   Total", True, ["100", "100.0"]),
+         ("Sex", True, []),
+         ("  Male", False, ["50", "50.0"]),
+         ("  Female", False, ["50", "50.0"]),
+         ("Region", True, []),
+         ("  Northeast", False, ["20", "20.0"]),
+         ("  Midwest", False, ["25", "25.0"]),
+         ("  South", False, ["35", "35.0"]),
+         ("  West", False, ["20", "20.0"])])
+
+
+# name: function writing the table to a path
+TABLES = {
+    "tabn900.10": lambda path: generate_table(path, "900.10", seed=1),
+    "tabn900.20": lambda path: generate_table(path, "900.20", standard_errors=False,
+                                              subtables=False, seed=2),
+    "tabn910.10": change_table,
+    "tabn910.20": state_row_table,
+    "tabn910.30": state_column_table,
+    "tabn910.40": region_breakdown_table,
+}
+
+
+def parse(name, directory):
+    path = TABLES[name](os.path.join(str(directory), f"{name}.xls"))
+    return Table(path)
+
+
+def baseline_path(name, frame):
+    return os.path.join(BASELINE_DIR, f"{name}_{frame}.csv")
+
+
+def as_text(df):
+    """Returns df with every value as text, the way read_csv gives it back"""
+
+    return df.astype(object).where(df.notna(), "").astype(str).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tables")
+    return {name: parse(name, directory) for name in TABLES}
+
+
+@pytest.mark.parametrize("frame", FRAMES)
+@pytest.mark.parametrize("name", list(TABLES))
+def test_matches_baseline(tables, name, frame):
+    expected = pd.read_csv(baseline_path(name, frame), dtype=str, keep_default_na=False)
+    found = as_text(getattr(tables[name], frame))
+
+    assert list(found.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(found, expected, check_index_type=False)
+
+
+
+@pytest.mark.parametrize("name", ["tabn900.10", "tabn900.20", "tabn910.10", "tabn910.40"])
+def test_bold_indented_totals_are_marked(tables, name):
+    row_info = tables[name].row_info
+    levels = row_info.filter(regex=r"^row_level_\d$").to_numpy(dtype=str)
+    is_total = row_info["is_total"] == "TRUE"
+
+    # exactly the rows whose own label is a total, one per subtable
+    labels = [[label for label in row if label != ""][-1] for row in levels]
+    assert list(is_total) == [label.startswith("Total") for label in labels]
+    assert is_total.sum() == row_info["digest_table_sub_id"].nunique()
+    assert set(row_info["is_total"]) == {"TRUE", "FALSE"}
+
+
+def test_standard_errors_are_stored_with_their_estimates(tables):
+    table = tables["tabn900.10"]
+    col_info = table.col_info.drop_duplicates("column_index").set_index("column_index")
+    se_columns = col_info.index[col_info["is_standard_error"] == "TRUE"]
+
+    assert list(se_columns) == ["B", "D", "F", "H"]
+    assert (table.table_info["has_SE"] == "TRUE").all()
+
+    cells = table.cell_values.set_index(["row_index", "column_index"])
+    assert not cells.index.get_level_values("column_index").isin(se_columns).any()
+
+    for se_column in se_columns:
+        estimate = col_info.loc[se_column, "paired_column_index"]
+        assert col_info.loc[estimate, "paired_column_index"] == se_column
+
+        for row_index, text in zip(table.row_info["row_index"], table.row_info[se_column]):
+            if text not in ("", "(†)"):
+                number = float(text.strip("()"))
+                assert cells.loc[(int(row_index), estimate), "standard_error"] == number
+
+
+def test_parentheses_outside_standard_error_columns_are_negative(tables):
+    table = tables["tabn910.10"]
+
+    assert (table.col_info["is_standard_error"] == "FALSE").all()
+    assert (table.col_info["paired_column_index"] == "").all()
+    assert (table.table_info["has_SE"] == "FALSE").all()
+
+    change = table.cell_values[table.cell_values["column_index"] == "B"]
+    assert change["value"].tolist()[:3] == [-5.0, -2.0, -3.0]
+    assert change["flag"].astype(str).tolist() == ["()", "()", "()", "†"]
+    assert change["standard_error"].isna().all()
+
+
+def test_multi_line_headers_and_column_letters(tables):
+    col_info = tables["tabn900.10"].col_info.drop_duplicates("column_index")
+
+    assert col_info["column_index"].tolist() == list("ABCDEFGH")
+    assert col_info["column_level_1"].tolist()[:2] == ["Total enrollment"] * 2
+    assert col_info["column_level_2"].tolist()[::2] == ["1990", "1995", "2000", "2005"]
+
+
+def test_every_footnote_of_a_reference_is_filled_in(tables):
+    row_info = tables["tabn900.10"].row_info
+    subgroup = row_info[row_info["row_level_2"] == "Subgroup 1"]
+
+    assert set(subgroup["row_ref_note_2"]) == {
+        "Includes imputations for nonreporting schools.:::"
+        "Excludes students enrolled in ungraded programs."}
+
+
+def test_footnote_columns_are_folded_into_their_values(tables):
+    table = tables["tabn900.10"]
+
+    # the footnote column after each standard error column is gone, its
+    # notes belong to the cells on its left
+    assert len(table.data_region.columns) == 8
+    notes = table.cell_info[table.cell_info["cell_note"].str.startswith("Excludes")]
+    assert len(notes) > 0
+    assert set(notes["column_index"]) <= {"B", "D", "F", "H"}
+
+
+@pytest.mark.parametrize("name, location_in", [
+    ("tabn910.20", "Row"),
+    ("tabn910.30", "Column"),
+    ("tabn910.40", "Title"),
+    ("tabn900.10", "Title"),
+])
+def test_location_in(tables, name, location_in):
+    assert set(tables[name].table_info["location_in"]) == {location_in}
+
+
+def test_states_by_row(tables):
+    row_info = tables["tabn910.20"].row_info
+
+    assert row_info["location"].tolist() == [
+        "United States", "Alabama", "Alaska", "Arizona", "Arkansas"]
+    assert row_info["location_type"].tolist() == ["Region"] + ["State"] * 4
+    assert (tables["tabn910.20"].col_info["location"] == "").all()
+
+
+def test_states_by_column(tables):
+    table = tables["tabn910.30"]
+
+    assert table.col_info["location"].tolist() == ["Alabama", "Alaska", "Arizona", "Arkansas"]
+    assert (table.col_info["location_type"] == "State").all()
+    assert (table.row_info["location"] == "").all()
+
+
+def test_region_breakdown_is_national(tables):
+    table = tables["tabn910.40"]
+
+    assert table.table_info[["location", "location_type"]].values.tolist() == [
+        ["United States", "Region"]]
+    assert (table.row_info["location"] == "").all()
+    assert (table.col_info["location"] == "").all()
+
+def update_baselines(directory):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+
+    for name in TABLES:
+        table = parse(name, directory)
+        for frame in FRAMES:
+            as_text(getattr(table, frame)).to_csv(baseline_path(name, frame), index=False)
+            print(baseline_path(name, frame))
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    if "--update" not in sys.argv[1:]:
+        sys.exit("usage: python table_regression_test.py --update")
+
+    with tempfile.TemporaryDirectory() as directory:
+        update_baselines(directory)
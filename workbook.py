@@ -0,0 +1,182 @@
+import re
+from datetime import time
+
+import numpy as np
+import xlrd
+from pandas.io.parsers import TextParser
+
+# Workbook class
+
+
+def get_leading_spaces(string):
+    string = str(string)
+    res = re.search(r"[^ ]", string)
+
+    if res:
+        return res.start()
+    else:
+        return 0
+
+
+def column_letters(n):
+    """Returns the first n spreadsheet column names, A to Z, AA and on"""
+
+    letters = []
+    for i in range(0, n):
+        name = ""
+        i += 1
+        while i > 0:
+            i, r = divmod(i - 1, 26)
+            name = chr(ord("A") + r) + name
+        letters.append(name)
+
+    return letters
+
+
+# A to ZZ, wider than any Digest table
+COLUMN_LETTERS = column_letters(702)
+
+
+def column_letter(i):
+    """Returns the name of the i-th column, counting from 0"""
+
+    if i < len(COLUMN_LETTERS):
+        return COLUMN_LETTERS[i]
+    return column_letters(i + 1)[-1]
+
+
+class StyleIndex():
+    """Per-row values and styles of the stub column (A) and column B
+
+    Every array is indexed by sheet row, so the row logic can be run on
+    plain lists without a workbook.
+    """
+
+    def __init__(self, values_a, values_b, bold_a, top_a, bottom_a, top_b, bottom_b):
+        # raw xlrd values, numbers are floats
+        self.values_a = np.array(values_a, dtype=object)
+        self.values_b = np.array(values_b, dtype=object)
+
+        self.bold_a = np.array(bold_a, dtype=bool)
+        self.indent_a = np.array([get_leading_spaces(v) for v in values_a],
+                                 dtype=int)
+
+        self.empty_a = np.array([v == "" for v in values_a], dtype=bool)
+        self.empty_b = np.array([v == "" for v in values_b], dtype=bool)
+
+        # border line styles, 1 is thin and 6 is double
+        self.top_a = np.array(top_a, dtype=int)
+        self.bottom_a = np.array(bottom_a, dtype=int)
+        self.top_b = np.array(top_b, dtype=int)
+        self.bottom_b = np.array(bottom_b, dtype=int)
+
+    def __len__(self):
+        return len(self.values_a)
+
+
+class Workbook():
+    """Opens a Digest workbook once and serves values and styles from it"""
+
+    def __init__(self, filename, sheet_index=0):
+        self.filename = filename
+
+        # the only place the BIFF stream is decoded
+        self.book = xlrd.open_workbook(self.filename, formatting_info=True)
+        self.sheet = self.book.sheet_by_index(sheet_index)
+        self.font = self.book.font_list
+        self.xf_list = self.book.xf_list
+
+        # cell values, converted the way pd.read_excel converts them
+        self.values = self.get_values()
+
+        # same frame pd.read_excel(filename, header=None) returns
+        self.raw_df = self.to_frame()
+
+    def get_values(self):
+        """Returns a list of rows of cell values"""
+
+        datemode = self.book.datemode
+        values = []
+
+        for row in range(0, self.sheet.nrows):
+            values.append([
+                self.parse_cell(value, typ, datemode)
+                for value, typ in zip(self.sheet.row_values(row), self.sheet.row_types(row))
+            ])
+
+        return values
+
+    def parse_cell(self, value, typ, datemode):
+        """Converts a cell value the same way pandas' xlrd reader does"""
+
+        if typ == xlrd.XL_CELL_DATE:
+            try:
+                value = xlrd.xldate.xldate_as_datetime(value, datemode)
+            except OverflowError:
+                return value
+
+            # dates on the epoch are times only
+            ymd = value.timetuple()[0:3]
+            if (not datemode and ymd == (1899, 12, 31)) or (datemode and ymd == (1904, 1, 1)):
+                value = time(value.hour, value.minute,
+                             value.second, value.microsecond)
+        elif typ == xlrd.XL_CELL_ERROR:
+            value = np.nan
+        elif typ == xlrd.XL_CELL_BOOLEAN:
+            value = bool(value)
+        elif typ == xlrd.XL_CELL_NUMBER:
+            # Excel numbers are always floats
+            if int(value) == value:
+                value = int(value)
+
+        return value
+
+    def to_frame(self, start=0, end=None):
+        """Returns rows start to end as a dataframe with inferred dtypes"""
+
+        rows = [list(row) for row in self.values[start:end]]
+
+        parser = TextParser(rows, header=None, skip_blank_lines=False)
+        return parser.read()
+
+    def get_style_index(self):
+        """Returns the StyleIndex of columns A and B, read in one pass"""
+
+        sh = self.sheet
+        cols = {}
+
+        for col in [0, 1]:
+            if col < sh.ncols:
+                xfs = [self.get_xf(row, col) for row in range(0, sh.nrows)]
+                cols[col] = {
+                    "values": sh.col_values(col),
+                    "bold": [self.font[xf.font_index].bold for xf in xfs],
+                    "top": [xf.border.top_line_style for xf in xfs],
+                    "bottom": [xf.border.bottom_line_style for xf in xfs],
+                }
+            else:
+                blank = [0] * sh.nrows
+                cols[col] = {"values": [""] * sh.nrows,
+                             "bold": blank, "top": blank, "bottom": blank}
+
+        return StyleIndex(
+            values_a=cols[0]["values"],
+            values_b=cols[1]["values"],
+            bold_a=cols[0]["bold"],
+            top_a=cols[0]["top"],
+            bottom_a=cols[0]["bottom"],
+            top_b=cols[1]["top"],
+            bottom_b=cols[1]["bottom"]
+        )
+
+    def get_xf(self, row, col):
+        return self.xf_list[self.sheet.cell_xf_index(row, col)]
+
+    def is_bold(self, row, col):
+        return bool(self.font[self.get_xf(row, col).font_index].bold)
+
+    def top_line_style(self, row, col):
+        return self.get_xf(row, col).border.top_line_style
+
+    def bottom_line_style(self, row, col):
+        return self.get_xf(row, col).border.bottom_line_style
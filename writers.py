@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset import DatasetWriter
+
+# Output writers
+#
+# Each writer takes the output frames one sheet at a time and streams the
+# column names followed by the rows, so no frame is transposed or copied
+# into one object array. Missing values are written as empty cells.
+
+# frame attribute and sheet name, in output order
+SHEETS = [
+    ("table_info", "table_info"),
+    ("row_info", "row_info"),
+    ("col_info", "column_info"),
+    ("cell_info", "cell_info"),
+    ("cell_values", "cell_values"),
+]
+
+FORMATS = ["xlsx", "csv", "jsonl", "parquet", "dataset"]
+
+
+def iter_rows(df):
+    """Yields the rows of df as tuples, with None for missing values"""
+
+    columns = []
+    for i in range(0, df.shape[1]):
+        values = df.iloc[:, i].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = None
+        columns.append(values)
+
+    return zip(*columns)
+
+
+def to_python(value):
+    """Returns numpy scalars as the python value json can encode"""
+
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class XlsxWriter():
+    """Writes every sheet to one workbook in xlsxwriter's constant memory mode
+
+    Rows are flushed to disk as soon as the next one starts. Strings are
+    always written as text, never as formulas or links.
+    """
+
+    def __init__(self, filename):
+        import xlsxwriter
+
+        self.filename = filename
+        self.book = xlsxwriter.Workbook(filename, {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+            "nan_inf_to_errors": True,
+        })
+
+    def write_sheet(self, sheet_name, df):
+        ws = self.book.add_worksheet(sheet_name)
+
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        for r, row in enumerate(iter_rows(df), 1):
+            ws.write_row(r, 0, [to_python(v) for v in row])
+
+    def close(self):
+        self.book.close()
+
+
+class CsvWriter():
+    """Writes each sheet to its own csv file next to filename"""
+
+    extension = ".csv"
+
+    def __init__(self, filename):
+        self.stem = os.path.splitext(filename)[0]
+        self.filenames = []
+
+    def sheet_filename(self, sheet_name):
+        filename = f"{self.stem}_{sheet_name}{self.extension}"
+        self.filenames.append(filename)
+        return filename
+
+    def write_sheet(self, sheet_name, df):
+        with open(self.sheet_filename(sheet_name), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(df.columns)
+            writer.writerows(iter_rows(df))
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter(CsvWriter):
+    """Writes each sheet to its own json lines file, one object per row"""
+
+    extension = ".jsonl"
+
+    def write_sheet(self, sheet_name, df):
+        columns = [str(c) for c in df.columns]
+
+        with open(self.sheet_filename(sheet_name), "w", encoding="utf-8") as f:
+            for row in iter_rows(df):
+                record = dict(zip(columns, map(to_python, row)))
+                f.write(json.dumps(record, ensure_ascii=False, default=str))
+                f.write("\n")
+
+
+class ParquetWriter(CsvWriter):
+    """Writes each sheet to its own parquet file, needs pyarrow
+
+    Columns that mix numbers and text are stored as text.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, filename):
+        import pyarrow  # noqa: F401
+
+        super().__init__(filename)
+
+    def write_sheet(self, sheet_name, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = []
+        for i in range(0, df.shape[1]):
+            values = df.iloc[:, i]
+
+            # compact columns are stored dictionary encoded
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                arrays.append(pa.array(values, from_pandas=True))
+                continue
+
+            if pd.api.types.infer_dtype(values, skipna=True) not in (
+                    "string", "empty", "integer", "floating", "boolean",
+                    "mixed-integer-float", "datetime", "date"):
+                values = values.map(lambda v: v if pd.isna(v) else str(v))
+            arrays.append(pa.array(values.to_numpy(dtype=object), from_pandas=True))
+
+        table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+        pq.write_table(table, self.sheet_filename(sheet_name))
+
+
+WRITERS = {
+    "xlsx": XlsxWriter,
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+    "dataset": DatasetWriter,
+}
+
+
+def write_frames(frames, filename, output_format="xlsx"):
+    """Writes {attribute: dataframe} as the output sheets
+
+    xlsx goes to filename, csv, jsonl and parquet write one file per sheet
+    named after filename, and dataset appends to the datasets under the
+    directory filename.
+    """
+
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    writer = WRITERS[output_format](filename)
+    try:
+        for attr, sheet_name in SHEETS:
+            writer.write_sheet(sheet_name, frames[attr])
+    finally:
+        writer.close()
+
+    return writer
@@ -0,0 +1,52 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from arrays import map_unique
+
+# Year detection
+
+# every match in a label is kept, in this order
+YEAR_PATTERNS = [re.compile(pattern) for pattern in [
+    r"^\s*(\d{4})\s*$",
+    r".*(\d{4}–\d{2})\s*$",
+    r".*(\d{4}-\d{2})\s*$",
+    r".*(\d{4}–\d{4})",
+    r".*(\d{4}-\d{2}) \(.*",
+    r".*(\d{4} to \d{4}).*",
+    r".*([Ff]all \d{4}).*",
+    r".*([Ss]pring \d{4}).*$",
+    r", (\d{4})\s*$",
+    r".*(\d{4}-\d{2} to \d{4}-\d{2}).*",
+    r".*(\d{4}-\d{2}), total$",
+]]
+
+
+def label_years(label):
+    """Returns the year matches in one label, comma separated"""
+
+    if not isinstance(label, str):
+        return ""
+
+    matches = [pattern.search(label) for pattern in YEAR_PATTERNS]
+    return ",".join(m.group(1) for m in matches if m)
+
+
+def find_years(df, cols):
+    """Returns the year of each row of df, read from its label columns
+
+    The matches of all labels in a row are run together and the text after
+    the last comma is the row's year. Each distinct label is only searched
+    once.
+    """
+
+    labels = df[cols].to_numpy(dtype=object)
+
+    years = map_unique(labels, label_years, missing="")
+
+    joined = np.full(labels.shape[0], "", dtype=object)
+    for i in range(0, labels.shape[1]):
+        joined = joined + years[:, i]
+
+    return pd.Series(joined, dtype=object).str.split(",").str[-1].to_numpy()